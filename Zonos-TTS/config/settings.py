@@ -136,6 +136,43 @@ AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY')
 AWS_TTS_BUCKET_NAME = config("AWS_TTS_BUCKET_NAME")
 AWS_QUESTION_BUCKET_NAME = config("AWS_QUESTION_BUCKET_NAME")
+
+TTS_MODEL_NAME = config("TTS_MODEL_NAME", default="Zyphra/Zonos-v0.1-hybrid")
+# "int8": backbone / head 가중치를 int8 로 (메모리 절반, CPU 노드용). transformer 모델(torch backbone)만 지원
+TTS_QUANTIZE = config("TTS_QUANTIZE", default="")
+
+# TTS 목소리 설정: voice id -> 스피커 임베딩을 만들 원본 음성 (임베딩은 TTS_SPEAKER_DIR 에 저장)
+TTS_VOICES = {
+    "default": BASE_DIR / "cloning_sample.wav",
+}
+TTS_DEFAULT_VOICE = "default"
+# 요청의 quality -> cfg_scale. "fast" 는 classifier-free guidance 를 끄고 배치를 절반으로 돌린다
+# (계산량, KV 캐시 메모리 절반. 중립적인 목소리의 짧은 질문에 적합)
+TTS_QUALITY_CFG_SCALES = {"high": 2.0, "fast": 1.0}
+TTS_DEFAULT_QUALITY = "high"
+# 0 보다 크면 KV 캐시를 이 개수의 페이지(64 토큰씩) 풀로 나눠 쓴다 (torch backbone 만 지원)
+TTS_KV_CACHE_PAGES = config("TTS_KV_CACHE_PAGES", default=0, cast=int)
+# 같은 요청(seed 포함)이면 바이트 단위로 같은 오디오: 결정적 커널 + 배치 없이 한 요청씩 생성 (처리량은 낮아짐)
+TTS_REPRODUCIBLE = config("TTS_REPRODUCIBLE", default=False, cast=bool)
+# 문장마다 생성 길이 상한 = 음소 수 / speaking_rate 로 예상한 길이 x 이 값. EOS 없이 상한에 닿으면 자르고 응답에 truncated 로 알린다
+TTS_LENGTH_SAFETY_FACTOR = config("TTS_LENGTH_SAFETY_FACTOR", default=2.0, cast=float)
+# 0 보다 크면 배치로 들어온 문장들의 음소 변환(eSpeak)을 이 개수의 프로세스로 병렬 처리
+TTS_PHONEMIZE_WORKERS = config("TTS_PHONEMIZE_WORKERS", default=0, cast=int)
+TTS_SPEAKER_DIR = config("TTS_SPEAKER_DIR", default=str(BASE_DIR / "speakers"))
+# TTS 서버(python manage.py run_tts_server)가 모델을 들고 있고, HTTP 워커들은 이 소켓으로 요청한다
+TTS_SERVER_ADDRESS = config("TTS_SERVER_ADDRESS", default=str(BASE_DIR / "tts.sock"))
+TTS_SERVER_AUTHKEY = config("TTS_SERVER_AUTHKEY", default=SECRET_KEY)
+TTS_SERVER_TIMEOUT = config("TTS_SERVER_TIMEOUT", default=300.0, cast=float)
+# TTS 서버 시작 시 모델 로드 후 한 번 돌려서 워밍업
+TTS_WARMUP = config("TTS_WARMUP", default=True, cast=bool)
+
+# TTS 캐시 설정
+TTS_CONDITIONING_CACHE_DIR = config("TTS_CONDITIONING_CACHE_DIR", default=str(BASE_DIR / "cache" / "conditioning"))
+# 꼬리 질문은 매번 새 문장이라 디스크 캐시가 계속 늘어난다. 이 크기를 넘으면 오래 안 쓴 것부터 삭제
+TTS_CONDITIONING_CACHE_MAX_BYTES = config("TTS_CONDITIONING_CACHE_MAX_BYTES", default=1024**3, cast=int)
+TTS_AUDIO_CACHE_DIR = config("TTS_AUDIO_CACHE_DIR", default=str(BASE_DIR / "cache" / "audio"))
+TTS_AUDIO_CACHE_MAX_BYTES = config("TTS_AUDIO_CACHE_MAX_BYTES", default=1024**3, cast=int)
+TTS_AUDIO_CACHE_PREFIX = config("TTS_AUDIO_CACHE_PREFIX", default="tts-cache/")
 # 인증 방식은 JWT 토큰만으로 사용
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import botocore.exceptions
+
+
+def tts_cache_key(text: str, **params) -> str:
+    """텍스트 + conditioning/샘플링 파라미터 전체로 만든 content address"""
+    payload = {"text": " ".join(text.split()), **params}
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    같은 요청으로 만들어진 최종 WAV 를 재사용하기 위한 2단 캐시.
+
+    - 로컬 디스크: `local_dir/<key>.wav`, 접근할 때마다 mtime 을 갱신하고 max_bytes 를 넘으면 오래된 것부터 삭제 (LRU)
+    - 오브젝트 스토어: `s3://bucket/prefix<key>.wav`, 다른 노드에서 만든 결과도 공유
+    """
+
+    def __init__(self, local_dir: str | Path, max_bytes: int, s3_client=None, bucket: str | None = None, prefix: str = "tts-cache/"):
+        self.local_dir = Path(local_dir)
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    def get_local(self, key: str) -> bytes | None:
+        path = self._local_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def get(self, key: str) -> bytes | None:
+        """로컬에 없으면 오브젝트 스토어에서 받아 로컬에도 채워 둔다."""
+        data = self.get_local(key)
+        if data is not None or self.s3_client is None:
+            return data
+        try:
+            data = self.s3_client.get_object(Bucket=self.bucket, Key=self._remote_key(key))["Body"].read()
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            return None
+        self._put_local(key, data)
+        return data
+
+    def has_remote(self, key: str) -> bool:
+        if self.s3_client is None:
+            return False
+        try:
+            self.s3_client.head_object(Bucket=self.bucket, Key=self._remote_key(key))
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            return False
+
+    def put(self, key: str, data: bytes):
+        self._put_local(key, data)
+        if self.s3_client is not None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self._remote_key(key), Body=data, ContentType="audio/wav")
+
+    def copy_to(self, key: str, bucket: str, dst_key: str) -> bool:
+        """캐시에 있으면 dst_key 로 복사하고 True. 원격에만 있으면 S3 안에서 copy_object 로 복사한다."""
+        data = self.get_local(key)
+        if data is not None:
+            self.s3_client.put_object(Bucket=bucket, Key=dst_key, Body=data, ContentType="audio/wav")
+            return True
+        if self.has_remote(key):
+            self.s3_client.copy_object(
+                CopySource={"Bucket": self.bucket, "Key": self._remote_key(key)}, Bucket=bucket, Key=dst_key
+            )
+            return True
+        return False
+
+    def _put_local(self, key: str, data: bytes):
+        with tempfile.NamedTemporaryFile(dir=self.local_dir, suffix=".tmp", delete=False) as f:
+            f.write(data)
+        os.replace(f.name, self._local_path(key))
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for path in self.local_dir.glob("*.wav"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def _local_path(self, key: str) -> Path:
+        return self.local_dir / f"{key}.wav"
+
+    def _remote_key(self, key: str) -> str:
+        return f"{self.prefix}{key}.wav"
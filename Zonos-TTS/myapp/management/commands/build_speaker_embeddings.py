@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from zonos.speaker_registry import SpeakerRegistry
+
+
+class Command(BaseCommand):
+    help = "TTS_VOICES 의 스피커 임베딩을 미리 계산해서 TTS_SPEAKER_DIR 에 저장 (서빙 노드는 저장된 파일만 로드)"
+
+    def handle(self, *args, **options):
+        registry = SpeakerRegistry(settings.TTS_SPEAKER_DIR, settings.TTS_VOICES)
+        for voice_id in registry.voice_ids:
+            registry.get(voice_id, device="cpu")
+            self.stdout.write(f"{voice_id}: {registry.digest(voice_id)}")
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp import tts, tts_server
+
+
+class Command(BaseCommand):
+    help = "모델을 한 번만 로드하는 TTS 서버 실행 (HTTP 워커들은 TTS_SERVER_ADDRESS 로 접속)"
+
+    def handle(self, *args, **options):
+        if settings.TTS_WARMUP:
+            tts.warm_up()
+        else:
+            tts.get_model()
+        tts_server.serve(settings.TTS_SERVER_ADDRESS, settings.TTS_SERVER_AUTHKEY.encode())
@@ -0,0 +1,160 @@
+import logging
+import struct
+import threading
+from typing import Callable, Iterable
+
+# S3 멀티파트 업로드는 마지막 파트를 제외하고 파트당 최소 5MB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# 길이를 모르는 스트리밍 WAV 에 쓰는 크기 값 (대부분의 플레이어가 "끝까지 재생"으로 처리)
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate: int, data_size: int | None = None, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """16-bit PCM WAV 헤더. data_size 를 모르면 스트리밍용 헤더를 만든다."""
+    riff_size = _UNKNOWN_SIZE if data_size is None else min(data_size + 36, _UNKNOWN_SIZE)
+    data_size = _UNKNOWN_SIZE if data_size is None else data_size
+    block_align = channels * bits_per_sample // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", riff_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, bits_per_sample,
+        b"data", data_size,
+    )  # fmt: skip
+
+
+class S3WavMultipartUpload:
+    """
+    스트리밍으로 만들어지는 PCM 을 S3 멀티파트 업로드로 올리는 writer.
+
+    헤더가 들어 있는 첫 파트는 메모리에 들고 있다가 close() 에서 실제 길이로 헤더를 고쳐 마지막에 올린다.
+    (S3 는 파트 번호 순서와 상관없이 업로드할 수 있다.) 이후 파트는 5MB 가 찰 때마다 바로 올린다.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, sample_rate: int):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.sample_rate = sample_rate
+
+        upload = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType="audio/wav")
+        self.upload_id = upload["UploadId"]
+        self.parts = []
+        self.data_size = 0
+        self._first_part = bytearray(wav_header(sample_rate))
+        self._buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.data_size += len(data)
+        if len(self._first_part) < S3_MIN_PART_SIZE:
+            self._first_part += data
+            return
+        self._buffer += data
+        if len(self._buffer) >= S3_MIN_PART_SIZE:
+            self._upload_part(len(self.parts) + 2, bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        try:
+            if self._buffer:
+                self._upload_part(len(self.parts) + 2, bytes(self._buffer))
+            self._first_part[:44] = wav_header(self.sample_rate, self.data_size)
+            self._upload_part(1, bytes(self._first_part))
+            parts = sorted(self.parts, key=lambda p: p["PartNumber"])
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def _upload_part(self, part_number: int, body: bytes):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=body
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+
+class S3WavStreamTee:
+    """
+    PCM 청크들을 WAV 응답으로 흘려보내면서 같은 내용을 S3WavMultipartUpload 로 올리는 iterator.
+    StreamingHttpResponse 의 내용으로 쓴다 (응답이 끝나면 Django 가 close() 를 부른다).
+
+    - 끝까지 읽히면 업로드를 마치고 on_complete(WAV 파일 bytes) 를 부른다.
+    - 끝나기 전에 닫히면 (클라이언트 연결 끊김, 아예 시작 전 포함) 나머지 생성과 업로드는 백그라운드 스레드에서 마친다.
+      워커는 바로 다음 요청을 받는다.
+    - 생성이나 업로드가 실패하면 업로드를 취소하고 생성도 멈춘다.
+    """
+
+    def __init__(
+        self, chunks: Iterable[bytes], upload: S3WavMultipartUpload, on_complete: Callable[[bytes], None] | None = None
+    ):
+        self._chunks = iter(chunks)
+        self.upload = upload
+        self.on_complete = on_complete
+        self._header = wav_header(upload.sample_rate)
+        self._pcm = []
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._header is not None:
+            header, self._header = self._header, None
+            return header
+        if self._done:
+            raise StopIteration
+        try:
+            data = next(self._chunks)
+            self._write(data)
+        except StopIteration:
+            self._done = True
+            self._complete()
+            raise
+        except BaseException:
+            self._done = True
+            self._abort()
+            raise
+        return data
+
+    def close(self):
+        if not self._done:
+            self._done = True
+            threading.Thread(target=self._drain, name="tts-upload", daemon=True).start()
+
+    def _drain(self):
+        try:
+            for data in self._chunks:
+                self._write(data)
+        except Exception:
+            logger.exception("Streaming TTS upload to %s failed", self.upload.key)
+            self._abort()
+            return
+        try:
+            self._complete()
+        except Exception:
+            logger.exception("Streaming TTS upload to %s failed", self.upload.key)
+
+    def _write(self, data: bytes):
+        self.upload.write(data)
+        self._pcm.append(data)
+
+    def _complete(self):
+        self.upload.close()  # 실패하면 스스로 abort 한다
+        if self.on_complete is not None:
+            self.on_complete(wav_header(self.upload.sample_rate, self.upload.data_size) + b"".join(self._pcm))
+
+    def _abort(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()  # TTS 서버 쪽 생성도 멈춘다
+        try:
+            self.upload.abort()
+        except Exception:
+            logger.warning("Could not abort the multipart upload of %s", self.upload.key, exc_info=True)
@@ -1,3 +1,181 @@
-from django.test import TestCase
+import importlib.util
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from .audio_cache import AudioCache
+from .streaming import S3_MIN_PART_SIZE, S3WavMultipartUpload, S3WavStreamTee
+from .views import FOLLOWUP_VOICE, default_seed, get_seed, requested_seed
+
+
+def fake_request(**data):
+    return SimpleNamespace(data=data)
+
+
+class SeedTests(SimpleTestCase):
+    def test_requested_seed(self):
+        self.assertIsNone(requested_seed(fake_request()))
+        self.assertEqual(requested_seed(fake_request(seed="42")), 42)
+        self.assertEqual(requested_seed(fake_request(seed=0)), 0)
+
+    def test_invalid_seed(self):
+        for seed in ["abc", -1, 2**63, [1]]:
+            with self.assertRaises(ValueError):
+                requested_seed(fake_request(seed=seed))
+            self.assertIsNone(get_seed(fake_request(seed=seed), "text", "digest", FOLLOWUP_VOICE, 2.0))
+
+    def test_default_seed_follows_text_and_settings(self):
+        seed = get_seed(fake_request(), "안녕하세요", "digest", FOLLOWUP_VOICE, 2.0)
+        self.assertEqual(seed, default_seed("안녕하세요", "digest", FOLLOWUP_VOICE, 2.0))
+        self.assertNotEqual(seed, default_seed("안녕하세요", "digest", FOLLOWUP_VOICE, 1.0))
+        self.assertNotEqual(seed, default_seed("반갑습니다", "digest", FOLLOWUP_VOICE, 2.0))
+
+
+class AudioCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = AudioCache(self.tmp.name, max_bytes=250)
+
+    def put(self, key, mtime):
+        self.cache.put(key, bytes(100))
+        os.utime(self.cache._local_path(key), (mtime, mtime))
+
+    def test_evicts_least_recently_used(self):
+        self.put("a", 1)
+        self.put("b", 2)
+        os.utime(self.cache._local_path("a"), (3, 3))  # "a" 를 다시 읽은 것처럼
+        self.put("c", 4)  # 300 bytes > 250: 가장 오래 안 쓴 "b" 가 지워진다
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+    def test_get_refreshes_mtime(self):
+        self.put("a", 1)
+        self.assertEqual(self.cache.get("a"), bytes(100))
+        self.assertGreater(os.path.getmtime(self.cache._local_path("a")), 1)
+
+    def test_missing_key(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertFalse(self.cache.has_remote("missing"))
+
+
+class FakeS3:
+    def __init__(self):
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = [self.parts[part["PartNumber"]] for part in MultipartUpload["Parts"]]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+class S3WavMultipartUploadTests(SimpleTestCase):
+    def upload(self, chunk_size, num_chunks):
+        s3 = FakeS3()
+        upload = S3WavMultipartUpload(s3, "bucket", "key.wav", 44100)
+        for i in range(num_chunks):
+            upload.write(bytes([i % 256]) * chunk_size)
+        upload.close()
+        return s3.completed, chunk_size * num_chunks
+
+    def assert_valid(self, parts, data_size):
+        # 마지막 파트를 빼면 모두 최소 크기 이상, 이어 붙이면 실제 길이가 적힌 헤더 + 전체 PCM
+        for part in parts[:-1]:
+            self.assertGreaterEqual(len(part), S3_MIN_PART_SIZE)
+        wav = b"".join(parts)
+        self.assertEqual(len(wav), 44 + data_size)
+        self.assertEqual(struct.unpack("<I", wav[4:8])[0], data_size + 36)
+        self.assertEqual(struct.unpack("<I", wav[40:44])[0], data_size)
+
+    def test_short_upload_is_one_part(self):
+        parts, data_size = self.upload(4096, 10)
+        self.assertEqual(len(parts), 1)
+        self.assert_valid(parts, data_size)
+
+    def test_long_upload_parts(self):
+        parts, data_size = self.upload(100_000, 200)  # 약 20MB
+        self.assertGreater(len(parts), 2)
+        self.assert_valid(parts, data_size)
+
+    def test_chunk_larger_than_part(self):
+        parts, data_size = self.upload(S3_MIN_PART_SIZE + 1, 3)
+        self.assert_valid(parts, data_size)
+
+
+
+class S3WavStreamTeeTests(SimpleTestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.upload = S3WavMultipartUpload(self.s3, "bucket", "key.wav", 44100)
+        self.completed = threading.Event()
+        self.wav = None
+
+    def on_complete(self, wav):
+        self.wav = wav
+        self.completed.set()
+
+    def tee(self, chunks):
+        return S3WavStreamTee(chunks, self.upload, on_complete=self.on_complete)
+
+    def test_streams_and_uploads_the_same_wav(self):
+        streamed = b"".join(self.tee([b"ab", b"cd"]))
+        self.assertEqual(len(streamed), 44 + 4)
+        self.assertEqual(b"".join(self.s3.completed), self.wav)
+        self.assertEqual(self.wav[44:], b"abcd")
+
+    def test_closed_early_finishes_upload_in_background(self):
+        tee = self.tee([b"ab", b"cd", b"ef"])
+        next(tee)  # header
+        next(tee)
+        tee.close()  # 클라이언트 연결 끊김
+        self.assertTrue(self.completed.wait(5))
+        self.assertEqual(self.wav[44:], b"abcdef")
+        self.assertFalse(self.s3.aborted)
+
+    def test_closed_before_start(self):
+        self.tee([b"ab"]).close()
+        self.assertTrue(self.completed.wait(5))
+        self.assertEqual(self.wav[44:], b"ab")
+
+    def test_failed_generation_aborts_upload(self):
+        def chunks():
+            yield b"ab"
+            raise RuntimeError("TTS 서버 연결이 끊어졌습니다")
+
+        tee = self.tee(chunks())
+        with self.assertRaises(RuntimeError):
+            list(tee)
+        self.assertTrue(self.s3.aborted)
+        self.assertIsNone(self.s3.completed)
+        self.assertIsNone(self.wav)
+
+
+@unittest.skipUnless(importlib.util.find_spec("torch"), "torch is not installed")
+@override_settings(TTS_REPRODUCIBLE=True)
+class ReproducibleSynthesisTests(SimpleTestCase):
+    # 모델을 로드해서 실제로 생성한다 (모델 가중치가 필요)
+    def test_same_seed_same_wav(self):
+        from . import tts
+
+        text = "자기소개를 간단히 해 주세요."
+        first = tts.synthesize(text, settings.TTS_DEFAULT_VOICE, FOLLOWUP_VOICE, cfg_scale=2.0, seed=1234)
+        second = tts.synthesize(text, settings.TTS_DEFAULT_VOICE, FOLLOWUP_VOICE, cfg_scale=2.0, seed=1234)
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(first[1], second[1])
@@ -0,0 +1,244 @@
+import io
+import os
+import threading
+import time
+import wave
+from concurrent.futures import as_completed
+from typing import Iterator
+
+import torch
+from django.conf import settings
+
+from zonos.autoencoder import DACStreamDecoder, pcm16
+from zonos.cache_pool import InferenceCachePool
+from zonos.conditioning import (
+    ConditioningPreset,
+    estimate_max_new_tokens,
+    make_cond_dict,
+    phonemize,
+    set_phonemize_workers,
+)
+from zonos.conditioning_cache import ConditioningCache
+from zonos.engine import ContinuousBatchingEngine
+from zonos.model import Zonos
+from zonos.paged_cache import PagedKVCache
+from zonos.speaker_registry import SpeakerRegistry
+from zonos.utils import DEFAULT_DEVICE as device
+
+# 프로세스 전체에서 하나만 쓰는 TTS 모델 / 엔진. TTS 서버 프로세스(run_tts_server)에서만 로드하고,
+# HTTP 워커들은 myapp.tts_client 로 이 서버에 요청한다.
+# 처음 get_model() 을 부른 스레드가 로드하고, 나머지 스레드는 로드가 끝날 때까지 기다린다.
+
+_lock = threading.Lock()
+_stream_lock = threading.Lock()  # 재현 모드의 model.generate / model.stream 은 한 번에 하나씩
+_model = None
+_engines: dict[float, ContinuousBatchingEngine] = {}
+_presets: dict[tuple, ConditioningPreset] = {}
+
+# voice id 별 스피커 임베딩 (처음 쓸 때 저장된 파일에서 로드, 없을 때만 계산)
+speaker_registry = SpeakerRegistry(settings.TTS_SPEAKER_DIR, settings.TTS_VOICES)
+
+
+def get_model() -> Zonos:
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                if settings.TTS_REPRODUCIBLE:
+                    # 같은 seed 면 같은 오디오가 나오도록 결정적인 커널만 사용 (cuBLAS 는 workspace 설정 필요)
+                    os.environ.setdefault("CUBLAS_WORKSPACE_CONFIG", ":4096:8")
+                    torch.use_deterministic_algorithms(True, warn_only=True)
+                model = Zonos.from_pretrained(
+                    settings.TTS_MODEL_NAME, device=device, quantize=settings.TTS_QUANTIZE or None
+                )
+                # 인사말/마무리 질문처럼 반복되는 문장은 conditioning 을 다시 계산하지 않도록 캐시
+                model.conditioning_cache = ConditioningCache(
+                    cache_dir=settings.TTS_CONDITIONING_CACHE_DIR,
+                    max_disk_bytes=settings.TTS_CONDITIONING_CACHE_MAX_BYTES,
+                )
+                # 스트리밍 생성마다 KV 캐시를 새로 할당하지 않고 길이 구간별로 재사용
+                model.cache_pool = InferenceCachePool(model)
+                if settings.TTS_KV_CACHE_PAGES and hasattr(model.backbone, "allocate_paged_cache"):
+                    # 시퀀스가 실제로 쓴 만큼만 KV 캐시 페이지를 잡아서 더 많은 요청을 동시에 처리
+                    model.kv_pages = PagedKVCache(model.backbone, settings.TTS_KV_CACHE_PAGES)
+                # 여러 질문을 한 번에 받으면 음소 변환을 이 개수의 프로세스로 나눠서
+                set_phonemize_workers(settings.TTS_PHONEMIZE_WORKERS)
+                print("Zonos model loaded:", _format_timings(model.load_timings))
+                _model = model
+    return _model
+
+
+def get_engine(cfg_scale: float = 2.0) -> ContinuousBatchingEngine:
+    # 동시에 들어오는 요청들을 하나의 디코딩 배치로 묶어서 생성 (cfg_scale 마다 엔진 하나, 캐시는 처음 쓸 때 할당)
+    model = get_model()
+    if cfg_scale not in _engines:
+        with _lock:
+            if cfg_scale not in _engines:
+                _engines[cfg_scale] = ContinuousBatchingEngine(model, cfg_scale=cfg_scale, kv_pages=model.kv_pages)
+    return _engines[cfg_scale]
+
+
+def voice_digest(voice_id: str) -> str | None:
+    """스피커 임베딩의 원본 음성 해시 (캐시 키에 사용). 없는 voice 면 None"""
+    if voice_id not in speaker_registry:
+        return None
+    return speaker_registry.digest(voice_id)
+
+
+def get_preset(voice_id: str, voice: dict) -> ConditioningPreset:
+    # 목소리 설정(스피커, 감정, 말하기 속도 ...) 마다 텍스트 외의 conditioning 은 처음 한 번만 계산하고,
+    # 요청마다 텍스트(음소) 부분만 계산해서 붙인다
+    model = get_model()
+    key = (voice_id, speaker_registry.digest(voice_id), repr(sorted(voice.items())))
+    if key not in _presets:
+        with _lock:
+            if key not in _presets:
+                cond_dict = make_cond_dict(speaker=speaker_registry.get(voice_id), **voice)
+                _presets[key] = model.make_preset(cond_dict)
+    return _presets[key]
+
+
+def make_generator(seed: int | None) -> torch.Generator | None:
+    """seed 로 초기화한 모델 device 의 generator. seed 가 없으면 None (전역 RNG 사용)"""
+    if seed is None:
+        return None
+    return torch.Generator(device=get_model().device).manual_seed(seed)
+
+
+def length_budget(cond_dict: dict) -> int:
+    # 질문 길이(음소 수 / speaking_rate) x 안전 계수만큼만 생성, EOS 를 못 내도 60초 전체를 돌지 않는다
+    return estimate_max_new_tokens(cond_dict, safety_factor=settings.TTS_LENGTH_SAFETY_FACTOR)
+
+
+def synthesize(
+    text: str, voice_id: str, voice: dict, cfg_scale: float = 2.0, seed: int | None = None
+) -> tuple[bytes, bool]:
+    return synthesize_batch([text], voice_id, voice, cfg_scale, [seed])[0]
+
+
+def synthesize_batch(
+    texts: list[str], voice_id: str, voice: dict, cfg_scale: float = 2.0, seeds: list[int | None] | None = None
+) -> list[tuple[bytes, bool]]:
+    """
+    문장들을 (WAV 파일 bytes, truncated) 로. 모두 엔진에 한꺼번에 넣어서 다른 요청들과 같은 배치에서 디코딩한다.
+    truncated 는 EOS 없이 길이 예산(length_budget)에서 잘린 경우 True.
+    seeds 가 있으면 문장마다 자기 seed 의 generator 로만 샘플링한다.
+    TTS_REPRODUCIBLE 이면 배치 구성에 따라 결과가 달라지지 않도록 엔진 대신 model.generate 로 하나씩 만든다.
+    """
+    model = get_model()
+    preset = get_preset(voice_id, voice)
+    seeds = seeds or [None] * len(texts)
+    cond_dicts = [preset.make_cond_dict(text) for text in texts]
+    # 모든 문장의 음소 변환을 한 번에 (결과는 캐시돼서 길이 예산 / conditioning 계산에서 다시 쓴다)
+    espeak_texts = [text for cond_dict in cond_dicts for text in cond_dict["espeak"][0]]
+    espeak_languages = [language for cond_dict in cond_dicts for language in cond_dict["espeak"][1]]
+    phonemize(espeak_texts, espeak_languages)
+    wavs = [None] * len(texts)
+    futures = {}
+    for i, (cond_dict, seed) in enumerate(zip(cond_dicts, seeds)):
+        max_new_tokens = length_budget(cond_dict)
+        conditioning = model.prepare_conditioning(cond_dict, preset=preset)
+        if settings.TTS_REPRODUCIBLE:
+            with _stream_lock:
+                codes, truncated = model.generate(
+                    conditioning,
+                    max_new_tokens=max_new_tokens,
+                    cfg_scale=cfg_scale,
+                    progress_bar=False,
+                    generator=make_generator(seed),
+                    return_truncated=True,
+                )
+            wavs[i] = (encode_wav(codes), bool(truncated[0]))
+        else:
+            futures[get_engine(cfg_scale).submit(conditioning, max_new_tokens, make_generator(seed))] = i
+
+    # 먼저 끝난 문장부터 디코딩 (그동안 엔진은 나머지 문장을 계속 생성한다)
+    for future in as_completed(futures):
+        wavs[futures[future]] = (encode_wav(future.result()), future.truncated)
+    return wavs
+
+
+def encode_wav(codes: torch.Tensor) -> bytes:
+    """
+    codes [1, 9, num_frames] -> 16-bit PCM WAV 파일 bytes.
+    DAC 디코딩은 윈도우 단위(decode_pcm16)라서 메모리가 문장 길이에 비례하지 않고, float 파형 전체를 CPU 로 옮기지 않는다.
+    """
+    autoencoder = get_model().autoencoder
+    pcm = autoencoder.decode_pcm16([codes])[0]
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(autoencoder.sampling_rate)
+        f.writeframes(pcm.numpy().tobytes())
+    return buffer.getvalue()
+
+
+def stream(
+    text: str, voice_id: str, voice: dict, cfg_scale: float = 2.0, seed: int | None = None
+) -> Iterator[bytes]:
+    """
+    생성되는 대로 16-bit PCM 청크를 돌려준다. 엔진에서 다른 요청들과 같은 배치로 디코딩하고,
+    정해진 코드 프레임이 쌓일 때마다 받아서 DACStreamDecoder 로 이어 붙인다.
+    TTS_REPRODUCIBLE 이면 synthesize 처럼 model.stream 으로 하나씩 만든다.
+    길이 예산에서 잘리면 서버 로그에만 남는다 (응답 헤더는 이미 나간 뒤).
+    """
+    model = get_model()
+    preset = get_preset(voice_id, voice)
+    cond_dict = preset.make_cond_dict(text)
+    conditioning = model.prepare_conditioning(cond_dict, preset=preset)
+    max_new_tokens = length_budget(cond_dict)
+    if settings.TTS_REPRODUCIBLE:
+        with _stream_lock:
+            chunks = model.stream(
+                conditioning, max_new_tokens=max_new_tokens, cfg_scale=cfg_scale, generator=make_generator(seed)
+            )
+            for wav in chunks:
+                yield to_pcm16(wav[0])
+        return
+
+    decoder = DACStreamDecoder(model.autoencoder)
+    for codes in get_engine(cfg_scale).stream(conditioning, max_new_tokens, make_generator(seed)):
+        wav = decoder.push(codes.masked_fill(codes >= 1024, 0))
+        if wav.shape[-1] > 0:
+            yield to_pcm16(wav[0])
+    # 디코더가 lookahead 로 남겨 둔 마지막 프레임들
+    yield to_pcm16(decoder.push(codes[..., :0], final=True)[0])
+
+
+def to_pcm16(wav: torch.Tensor) -> bytes:
+    """[1, num_samples] 또는 [num_samples] float 파형 -> little-endian int16 PCM 바이트"""
+    return pcm16(wav.flatten()).cpu().numpy().tobytes()
+
+
+def warm_up():
+    """실제로 요청을 처리할 모델/엔진 인스턴스를 로드하고 한 번 돌려 둔다."""
+    timings = {}
+
+    model = get_model()
+    timings.update(model.load_timings)
+
+    t0 = time.perf_counter()
+    speaker = speaker_registry.get(settings.TTS_DEFAULT_VOICE)
+    timings["speaker"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cond_dict = make_cond_dict(
+        text="안녕하세요. 시스템을 초기화 중입니다.",
+        speaker=speaker,
+        language="ko",
+        emotion=[0.0] * 7 + [1.0],
+        speaking_rate=23.0,
+        pitch_std=20.0,
+    )
+    conditioning = model.prepare_conditioning(cond_dict)
+    codes = get_engine().generate(conditioning)
+    encode_wav(codes)
+    timings["warmup_generate"] = time.perf_counter() - t0
+
+    print("Zonos model warmed up:", _format_timings(timings))
+    return timings
+
+
+def _format_timings(timings: dict) -> str:
+    return ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
@@ -0,0 +1,86 @@
+from multiprocessing.connection import Client, Connection
+from typing import Iterator
+
+from django.conf import settings
+
+
+class TTSServerError(Exception):
+    pass
+
+
+class TTSClient:
+    """
+    TTS 서버(myapp.tts_server)에 요청하는 클라이언트. HTTP 워커는 모델을 로드하지 않고 이것만 쓴다.
+    호출마다 새로 연결하므로 여러 스레드에서 같이 써도 된다.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout: float = 300.0):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+
+    def voice_digest(self, voice_id: str) -> str | None:
+        return self._call("voice_digest", voice_id=voice_id)
+
+    def synthesize(
+        self, text: str, voice_id: str, voice: dict, cfg_scale: float = 2.0, seed: int | None = None
+    ) -> tuple[bytes, bool]:
+        """
+        (WAV 파일 bytes, truncated). truncated 는 EOS 없이 길이 예산에서 잘렸는지.
+        같은 seed 면 같은 샘플링 (seed 가 없으면 매번 다름)
+        """
+        return self._call("synthesize", text=text, voice_id=voice_id, voice=voice, cfg_scale=cfg_scale, seed=seed)
+
+    def synthesize_batch(
+        self, texts: list[str], voice_id: str, voice: dict, cfg_scale: float = 2.0, seeds: list[int | None] | None = None
+    ) -> list[tuple[bytes, bool]]:
+        return self._call(
+            "synthesize_batch", texts=texts, voice_id=voice_id, voice=voice, cfg_scale=cfg_scale, seeds=seeds
+        )
+
+    def stream(
+        self, text: str, voice_id: str, voice: dict, cfg_scale: float = 2.0, seed: int | None = None
+    ) -> tuple[int, Iterator[bytes]]:
+        """(sample_rate, 16-bit PCM 청크 iterator). iterator 를 닫으면 서버 쪽 생성도 멈춘다."""
+        conn = self._connect()
+        try:
+            conn.send(("stream", dict(text=text, voice_id=voice_id, voice=voice, cfg_scale=cfg_scale, seed=seed)))
+            _, sample_rate = self._recv(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return sample_rate, self._chunks(conn)
+
+    def _chunks(self, conn: Connection) -> Iterator[bytes]:
+        with conn:
+            while True:
+                status, pcm = self._recv(conn)
+                if status == "end":
+                    return
+                yield pcm
+
+    def _call(self, op: str, **kwargs):
+        with self._connect() as conn:
+            conn.send((op, kwargs))
+            return self._recv(conn)[1]
+
+    def _connect(self) -> Connection:
+        try:
+            return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        except OSError as e:
+            raise TTSServerError(f"TTS 서버에 연결할 수 없습니다 ({self.address}): {e}") from e
+
+    def _recv(self, conn: Connection):
+        if not conn.poll(self.timeout):
+            raise TTSServerError("TTS 서버 응답 시간 초과")
+        try:
+            status, value = conn.recv()
+        except EOFError as e:
+            raise TTSServerError("TTS 서버 연결이 끊어졌습니다") from e
+        if status == "error":
+            raise TTSServerError(value)
+        return status, value
+
+
+def get_client() -> TTSClient:
+    return TTSClient(settings.TTS_SERVER_ADDRESS, settings.TTS_SERVER_AUTHKEY.encode(), settings.TTS_SERVER_TIMEOUT)
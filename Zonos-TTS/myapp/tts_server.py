@@ -0,0 +1,61 @@
+import os
+import threading
+from multiprocessing.connection import Connection, Listener
+
+from . import tts
+
+# 모델을 가진 TTS 서버. HTTP 워커(tts_client.TTSClient)들이 Unix 소켓으로 접속한다.
+#
+# 요청 하나에 연결 하나: 클라이언트가 (op, kwargs) 를 보내면
+#   - 일반 요청은 ("ok", 결과) 하나를 돌려주고
+#   - "stream" 은 ("start", sample_rate), ("chunk", pcm) ..., ("end", None) 을 차례로 보낸다.
+# 실패하면 ("error", 메시지).
+# 연결마다 스레드를 하나씩 쓰고, 모든 워커의 생성 요청은 같은 엔진(tts.get_engine())의 배치로 모인다.
+
+_HANDLERS = {
+    "voice_digest": tts.voice_digest,
+    "synthesize": tts.synthesize,
+    "synthesize_batch": tts.synthesize_batch,
+}
+
+
+def serve(address: str, authkey: bytes):
+    if os.path.exists(address):
+        os.unlink(address)  # 이전에 비정상 종료한 서버의 소켓 파일
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        print("TTS server listening on", address)
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:  # 인증 실패 등은 그 연결만 버린다
+                print("TTS server: rejected connection:", e)
+                continue
+            threading.Thread(target=_handle, args=(conn,), daemon=True).start()
+
+
+def _handle(conn: Connection):
+    with conn:
+        try:
+            op, kwargs = conn.recv()
+            if op == "stream":
+                _stream(conn, **kwargs)
+            else:
+                conn.send(("ok", _HANDLERS[op](**kwargs)))
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 먼저 끊음
+        except Exception as e:
+            try:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+            except OSError:
+                pass
+
+
+def _stream(conn: Connection, text: str, voice_id: str, voice: dict, cfg_scale: float, seed: int | None = None):
+    chunks = tts.stream(text, voice_id, voice, cfg_scale, seed)
+    try:
+        conn.send(("start", tts.get_model().autoencoder.sampling_rate))
+        for pcm in chunks:
+            conn.send(("chunk", pcm))
+        conn.send(("end", None))
+    finally:
+        chunks.close()
@@ -1,9 +1,11 @@
 from django.urls import path
 from .views import *
+from .views import stream_followup_question
 
 urlpatterns = [
     # path('login/', login, name='login'),
     path('generate-followup-question/tts/', generate_followup_question, name='generate_followup_question'),
+    path('generate-followup-question/tts/stream/', stream_followup_question, name='stream_followup_question'),
     path('generate-resume-question/', generate_resume_question, name='generate_resume_question'),
     path("healthz", health_check),
 ]
\ No newline at end of file
@@ -6,34 +6,98 @@ from rest_framework.decorators import api_view, permission_classes
 from datetime import datetime
 import tempfile
 import boto3
-import torchaudio
-import torch
 import os
 import io
 import hmac
 import hashlib
 import base64
 import re
-from zonos.model import Zonos
-from zonos.conditioning import make_cond_dict
-from zonos.utils import DEFAULT_DEVICE as device
 from django.conf import settings
-from threading import Lock
-from itertools import cycle
 # from .models import Resume
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from .audio_cache import AudioCache, tts_cache_key
+from .streaming import S3WavMultipartUpload, S3WavStreamTee
+from .tts_client import get_client
 
-# Create your views here.
-model = Zonos.from_pretrained("Zyphra/Zonos-v0.1-hybrid", device=device)
+# 모델은 TTS 서버 프로세스에만 있고, 이 워커들은 소켓으로 요청만 보낸다 (myapp.tts_server)
+tts_client = get_client()
 
-audio_path = os.path.join(settings.BASE_DIR, "cloning_sample.wav")
-speaker_wav, sampling_rate = torchaudio.load(audio_path)
-speaker = model.make_speaker_embedding(speaker_wav, sampling_rate)
+# 질문 종류별 목소리 설정
+FOLLOWUP_VOICE = dict(
+    language="ko",
+    emotion=[0.05, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.95],
+    speaking_rate=23.0,
+    pitch_std=20.0,
+)
+RESUME_VOICE = dict(
+    language="ko",
+    emotion=[0.10, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.9],
+    speaking_rate=23.0,
+    pitch_std=20.0,
+)
 
 # S3 업로드
 s3_client = boto3.client('s3')
 bucket_name = settings.AWS_TTS_BUCKET_NAME
 
+# 같은 문장 + 같은 설정이면 모델을 돌리지 않고 이전 결과 WAV 를 재사용
+audio_cache = AudioCache(
+    settings.TTS_AUDIO_CACHE_DIR,
+    settings.TTS_AUDIO_CACHE_MAX_BYTES,
+    s3_client=s3_client,
+    bucket=bucket_name,
+    prefix=settings.TTS_AUDIO_CACHE_PREFIX,
+)
+
+
+def get_speaker(request):
+    # (voice id, 스피커 임베딩 원본 음성 해시). 없는 voice 면 해시는 None
+    voice_id = request.data.get('voice') or settings.TTS_DEFAULT_VOICE
+    return voice_id, tts_client.voice_digest(voice_id)
+
+
+def get_cfg_scale(request):
+    # quality: "high" (classifier-free guidance) / "fast" (guidance 없이, 계산량 절반). 없는 값이면 None
+    quality = request.data.get('quality') or settings.TTS_DEFAULT_QUALITY
+    return settings.TTS_QUALITY_CFG_SCALES.get(quality)
+
+
+def requested_seed(request):
+    # 요청에 들어온 seed (0 <= seed < 2**63). 없으면 None, 잘못된 값이면 ValueError
+    seed = request.data.get('seed')
+    if seed is None:
+        return None
+    try:
+        seed = int(seed)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid seed: {seed}") from None
+    if not 0 <= seed < 2**63:
+        raise ValueError(f"invalid seed: {seed}")
+    return seed
+
+
+def default_seed(text, speaker, voice, cfg_scale):
+    # 문장 + 설정에서 정해지는 seed (같은 요청 -> 같은 오디오 -> 캐시 재사용)
+    return int(audio_cache_key(text, speaker, voice, cfg_scale)[:8], 16) & 0x7FFFFFFF
+
+
+def get_seed(request, text, speaker, voice, cfg_scale):
+    # 요청의 seed, 없으면 default_seed. 잘못된 값이면 None
+    try:
+        seed = requested_seed(request)
+    except ValueError:
+        return None
+    return default_seed(text, speaker, voice, cfg_scale) if seed is None else seed
+
+
+def audio_cache_key(text, speaker, voice, cfg_scale, seed=None):
+    # 샘플링 설정(min_p)은 engine / model.stream 기본값. 양자화한 모델은 출력이 달라서 다른 모델로 취급
+    model = settings.TTS_MODEL_NAME
+    if settings.TTS_QUANTIZE:
+        model = f"{model}:{settings.TTS_QUANTIZE}"
+    return tts_cache_key(text, model=model, speaker=speaker, cfg_scale=cfg_scale, min_p=0.1, seed=seed, **voice)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 # @permission_classes([AllowAny])  # 인증 없이 Postman에서 테스트 가능
@@ -47,44 +111,103 @@ def generate_followup_question(request):
     if not text:
         return Response({'error': 'text field is required'}, status=400)
 
-    try:
-        # 텍스트와 스피커 임베딩으로 conditioning 구성
-        cond_dict = make_cond_dict(
-            text=text,
-            speaker=speaker,
-            language="ko",
-            emotion=[0.05, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.95],
-            speaking_rate=23.0,
-            pitch_std=20.0,
-        )
-        conditioning = model.prepare_conditioning(cond_dict)
-
-        # Zonos 모델로 음성 생성
-        codes = model.generate(conditioning)
-        wavs = model.autoencoder.decode(codes).cpu()
-
-         # 메모리 버퍼 생성
-        buffer = io.BytesIO()
-        # 메모리 버퍼에 wav 저장
-        torchaudio.save(buffer, wavs[0], model.autoencoder.sampling_rate, format="wav")
-        buffer.seek(0)  # 버퍼 위치 초기화
+    voice_id, speaker = get_speaker(request)
+    if speaker is None:
+        return Response({'error': f'unknown voice: {voice_id}'}, status=400)
+    cfg_scale = get_cfg_scale(request)
+    if cfg_scale is None:
+        return Response({'error': f"unknown quality: {request.data.get('quality')}"}, status=400)
+    seed = get_seed(request, text, speaker, FOLLOWUP_VOICE, cfg_scale)
+    if seed is None:
+        return Response({'error': f"invalid seed: {request.data.get('seed')}"}, status=400)
 
+    try:
         email_prefix = user.email.split('@')[0]
         filename = f"questions{question_number}.wav"
         s3_key = f'{email_prefix}/{filename}'  # 원하면 고유 이름으로 변경
-        s3_client.upload_fileobj(buffer, bucket_name, s3_key)
-
         file_url = f'https://{bucket_name}.s3.amazonaws.com/{s3_key}'
 
+        # 같은 질문을 이미 만든 적이 있으면 캐시된 WAV 를 복사만 한다
+        cache_key = audio_cache_key(text, speaker, FOLLOWUP_VOICE, cfg_scale, seed)
+        if audio_cache.copy_to(cache_key, bucket_name, s3_key):
+            return Response({
+                "message": "TTS 캐시 재사용 및 S3 업로드 성공",
+                "file_url": file_url,
+                "seed": seed,
+                "truncated": False
+            }, status=200)
+
+        # TTS 서버에서 음성 생성 (모든 워커의 요청이 같은 배치에서 디코딩됨)
+        wav, truncated = tts_client.synthesize(text, voice_id, FOLLOWUP_VOICE, cfg_scale, seed)
+
+        s3_client.upload_fileobj(io.BytesIO(wav), bucket_name, s3_key)
+        if not truncated:  # 길이 예산에서 잘린 결과는 재사용하지 않는다
+            audio_cache.put(cache_key, wav)
+
         response = {
             "message": "TTS 생성 및 S3 업로드 성공",
-            "file_url": file_url
+            "file_url": file_url,
+            "seed": seed,
+            "truncated": truncated
         }
 
         return Response(response, status=200)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stream_followup_question(request):
+    """
+    generate_followup_question 의 스트리밍 버전.
+    생성되는 대로 WAV 청크를 응답으로 흘려보내고, 같은 청크를 S3 멀티파트 업로드로도 올린다.
+    """
+    text = request.data.get('text')
+    question_number = request.data.get('question_number')
+    if not text:
+        return Response({'error': 'text field is required'}, status=400)
+
+    voice_id, speaker = get_speaker(request)
+    if speaker is None:
+        return Response({'error': f'unknown voice: {voice_id}'}, status=400)
+    cfg_scale = get_cfg_scale(request)
+    if cfg_scale is None:
+        return Response({'error': f"unknown quality: {request.data.get('quality')}"}, status=400)
+    seed = get_seed(request, text, speaker, FOLLOWUP_VOICE, cfg_scale)
+    if seed is None:
+        return Response({'error': f"invalid seed: {request.data.get('seed')}"}, status=400)
+
+    email_prefix = request.user.email.split('@')[0]
+    s3_key = f'{email_prefix}/questions{question_number}.wav'
+    file_url = f'https://{bucket_name}.s3.amazonaws.com/{s3_key}'
+
+    chunks = None
+    try:
+        # 캐시에 있으면 스트리밍할 필요 없이 바로 전체 WAV 를 돌려준다
+        cache_key = audio_cache_key(text, speaker, FOLLOWUP_VOICE, cfg_scale, seed)
+        cached = audio_cache.get(cache_key)
+        if cached is not None:
+            s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=cached, ContentType="audio/wav")
+            response = HttpResponse(cached, content_type="audio/wav")
+            response["X-TTS-File-Url"] = file_url
+            response["X-TTS-Seed"] = str(seed)
+            return response
+
+        sample_rate, chunks = tts_client.stream(text, voice_id, FOLLOWUP_VOICE, cfg_scale, seed)
+        upload = S3WavMultipartUpload(s3_client, bucket_name, s3_key, sample_rate)
+    except Exception as e:
+        if chunks is not None:
+            chunks.close()  # TTS 서버 쪽 생성도 멈춘다
+        return Response({'error': str(e)}, status=500)
+
+    # 여기부터는 업로드가 끝나거나 취소될 때까지 S3WavStreamTee 가 책임진다
+    # (클라이언트 연결이 끊겨도 S3 파일은 백그라운드에서 끝까지 만들어 둔다)
+    tee = S3WavStreamTee(chunks, upload, on_complete=lambda wav: audio_cache.put(cache_key, wav))
+    response = StreamingHttpResponse(tee, content_type="audio/wav")
+    response["X-TTS-File-Url"] = file_url
+    response["X-TTS-Seed"] = str(seed)
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_resume_question(request):
@@ -92,6 +215,17 @@ def generate_resume_question(request):
     user_email = request.user.email.split('@')[0]
     prefix = f"{user_email}/"
 
+    voice_id, speaker = get_speaker(request)
+    if speaker is None:
+        return Response({'error': f'unknown voice: {voice_id}'}, status=400)
+    cfg_scale = get_cfg_scale(request)
+    if cfg_scale is None:
+        return Response({'error': f"unknown quality: {request.data.get('quality')}"}, status=400)
+    try:
+        requested_seed(request)  # 문장마다의 seed 는 아래에서 (seed 가 없으면 문장마다 다름)
+    except ValueError:
+        return Response({'error': f"invalid seed: {request.data.get('seed')}"}, status=400)
+
     try:
         s3 = boto3.client('s3')
         response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
@@ -111,48 +245,54 @@ def generate_resume_question(request):
         if not target_files:
             return Response({"error": "No text files found in your S3 folder."}, status=404)
 
-        generated_files = []
-
-        for key in sorted(target_files):
+        target_files = sorted(target_files)
+        texts = []
+        for key in target_files:
             # 텍스트 1개 다운로드
             temp = tempfile.NamedTemporaryFile(delete=False, suffix=".txt")
             s3.download_fileobj(Bucket=bucket, Key=key, Fileobj=temp)
             temp.close()
 
             with open(temp.name, 'r', encoding='utf-8') as f:
-                text = f.read().strip()
-
-            # TTS 생성
-            cond_dict = make_cond_dict(
-                text=text,
-                speaker=speaker,
-                language="ko",
-                emotion=[0.10, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.9],
-                speaking_rate=23.0,
-                pitch_std=20.0,
-            )
-            conditioning = model.prepare_conditioning(cond_dict)
-            codes = model.generate(conditioning)
-            wavs = model.autoencoder.decode(codes).cpu()
-
-            # 메모리에 저장
-            buffer = io.BytesIO()
-            torchaudio.save(buffer, wavs[0], model.autoencoder.sampling_rate, format="wav")
-            buffer.seek(0)
-
-            # 파일명 및 업로드
+                texts.append(f.read().strip())
+
+        generated_files = []
+        missing = []
+        for key, text in zip(target_files, texts):
+            # 파일명
             filename = f"{os.path.basename(key).replace('.txt','')}.wav"
             s3_key = f'{user_email}/{filename}'
-            s3.upload_fileobj(buffer, bucket_name, s3_key)
+            seed = get_seed(request, text, speaker, RESUME_VOICE, cfg_scale)
+            cache_key = audio_cache_key(text, speaker, RESUME_VOICE, cfg_scale, seed)
 
             file_url = f'https://{bucket_name}.s3.amazonaws.com/{s3_key}'
-            generated_files.append({
+            result = {
                 "text_file": key,
-                "tts_file_url": file_url
-            })
+                "tts_file_url": file_url,
+                "seed": seed,
+                "truncated": False
+            }
+            generated_files.append(result)
+
+            # 캐시에 있는 질문은 복사만 하고, 없는 질문만 생성
+            if not audio_cache.copy_to(cache_key, bucket_name, s3_key):
+                missing.append((text, seed, s3_key, cache_key, result))
+
+        if missing:
+            # 질문들을 TTS 서버에 한 번에 보내서 같은 배치로 생성 (각 질문은 자기 EOS 에서 끝남)
+            missing_texts = [text for text, _, _, _, _ in missing]
+            seeds = [seed for _, seed, _, _, _ in missing]
+            wavs = tts_client.synthesize_batch(missing_texts, voice_id, RESUME_VOICE, cfg_scale, seeds)
+
+            for (_, _, s3_key, cache_key, result), (wav, truncated) in zip(missing, wavs):
+                # 업로드
+                s3.upload_fileobj(io.BytesIO(wav), bucket_name, s3_key)
+                result["truncated"] = truncated
+                if not truncated:  # 길이 예산에서 잘린 결과는 재사용하지 않는다
+                    audio_cache.put(cache_key, wav)
 
         return Response({
-            "message": "TTS 생성 및 S3 업로드 성공 (순차 처리)",
+            "message": "TTS 생성 및 S3 업로드 성공 (배치 처리)",
             "results": generated_files
         }, status=200)
 
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of the per-step codebook embedding and head projection: one layer per codebook (the original
+`ModuleList` layout) against `CodebookEmbedding` / `CodebookHeads`, loaded from the same weights.
+
+Run from the Zonos-TTS directory:
+
+    python -m scripts.bench_codebooks --batch-size 2 --device cpu
+"""
+
+import argparse
+
+import torch
+import torch.nn as nn
+
+from scripts.bench_sampling import bench
+from zonos.codebooks import CodebookEmbedding, CodebookHeads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=2, help="rows per step, 2 per utterance with CFG")
+    parser.add_argument("--dim", type=int, default=2048)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    num_codebooks, dim = 9, args.dim
+    with torch.device(device):
+        embeddings = nn.ModuleList([nn.Embedding(1026, dim) for _ in range(num_codebooks)]).bfloat16()
+        heads = nn.ModuleList([nn.Linear(dim, 1025, bias=False) for _ in range(num_codebooks)]).bfloat16()
+        fused_embeddings = CodebookEmbedding(num_codebooks, 1026, dim).bfloat16()
+        fused_heads = CodebookHeads(num_codebooks, dim, 1032).bfloat16()
+    fused_embeddings.load_state_dict(embeddings.state_dict())
+    fused_heads.load_state_dict(heads.state_dict())
+
+    codes = torch.randint(0, 1026, (args.batch_size, num_codebooks, 1), device=device)
+    hidden_states = torch.randn(args.batch_size, 1, dim, device=device, dtype=torch.bfloat16)
+
+    def reference_step():
+        embeds = sum(emb(codes[:, i]) for i, emb in enumerate(embeddings))
+        return embeds, torch.stack([head(hidden_states) for head in heads], dim=1)
+
+    def fused_step():
+        return fused_embeddings(codes), fused_heads(hidden_states)
+
+    with torch.inference_mode():
+        (embeds, logits), (fused_embeds, fused_logits) = reference_step(), fused_step()
+        embeds_err = (embeds.float() - fused_embeds.float()).abs().max().item()
+        logits_err = (logits.float() - fused_logits[..., :1025].float()).abs().max().item()
+        reference = bench(reference_step, args.steps, device)
+        fast = bench(fused_step, args.steps, device)
+
+    print(f"batch {args.batch_size}, dim {dim}, bfloat16 on {device}")
+    print(f"per-codebook layers: {reference * 1e6:8.1f} us/step")
+    print(f"fused:               {fast * 1e6:8.1f} us/step ({reference / fast:.2f}x)")
+    print(f"max abs difference:  embeddings {embeds_err:.4f}, logits {logits_err:.4f}")
+
+
+if __name__ == "__main__":
+    main()
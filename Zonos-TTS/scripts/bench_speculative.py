@@ -0,0 +1,96 @@
+"""
+Speculative decoding against plain decoding: acceptance rate, target forwards per frame and wall-clock speedup.
+
+Both models need the torch backbone. Run from the Zonos-TTS directory:
+
+    python -m scripts.bench_speculative --model Zyphra/Zonos-v0.1-transformer --draft-model path/to/draft \\
+        --num-draft-frames 4 --text "자기소개를 간단히 해 주세요."
+"""
+
+import argparse
+import time
+
+import torch
+
+from zonos.conditioning import estimate_max_new_tokens, make_cond_dict
+from zonos.model import Zonos
+from zonos.speculative import SpeculativeDecoder, SpeculativeStats
+from zonos.utils import DEFAULT_DEVICE
+
+
+def timed(fn, device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    t0 = time.perf_counter()
+    result = fn()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Zyphra/Zonos-v0.1-transformer")
+    parser.add_argument("--draft-model", required=True)
+    parser.add_argument("--num-draft-frames", type=int, default=4)
+    parser.add_argument("--text", default="자기소개를 간단히 해 주세요.")
+    parser.add_argument("--language", default="ko")
+    parser.add_argument("--cfg-scale", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--device", default=str(DEFAULT_DEVICE))
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    model = Zonos.from_pretrained(args.model, device=args.device, backbone="torch")
+    draft_model = Zonos.from_pretrained(args.draft_model, device=args.device, backbone="torch")
+    decoder = SpeculativeDecoder(model, draft_model, num_draft_frames=args.num_draft_frames)
+
+    cond_dict = make_cond_dict(text=args.text, language=args.language)
+    conditioning = model.prepare_conditioning(cond_dict)
+    draft_conditioning = draft_model.prepare_conditioning(cond_dict)
+    max_new_tokens = estimate_max_new_tokens(cond_dict)
+
+    # Same seed for both: the outputs differ (different random draws), but follow the same distribution
+    plain_time = speculative_time = 0.0
+    plain_frames = speculative_frames = 0
+    for run in range(args.runs + 1):  # the first run of each is warm-up
+        generator = torch.Generator(device=device).manual_seed(run)
+        codes, elapsed = timed(
+            lambda generator=generator: model.generate(
+                conditioning,
+                max_new_tokens=max_new_tokens,
+                cfg_scale=args.cfg_scale,
+                progress_bar=False,
+                disable_torch_compile=True,
+                generator=generator,
+            ),
+            device,
+        )
+        if run > 0:
+            plain_time += elapsed
+            plain_frames += codes.shape[-1]
+
+        generator = torch.Generator(device=device).manual_seed(run)
+        if run == 1:
+            decoder.stats = SpeculativeStats()
+        codes, elapsed = timed(
+            lambda generator=generator: decoder.generate(
+                conditioning, draft_conditioning, max_new_tokens, cfg_scale=args.cfg_scale, generator=generator
+            ),
+            device,
+        )
+        if run > 0:
+            speculative_time += elapsed
+            speculative_frames += codes.shape[-1]
+
+    stats = decoder.stats
+    plain_fps, speculative_fps = plain_frames / plain_time, speculative_frames / speculative_time
+    print(f"{args.model} with draft {args.draft_model}, {args.num_draft_frames} draft frames, {args.runs} runs")
+    print(f"acceptance rate:    {stats.acceptance_rate * 100:.1f}% ({stats.accepted}/{stats.drafted} frames)")
+    print(f"frames per forward: {stats.frames_per_forward:.2f}")
+    print(f"plain:              {plain_fps:8.1f} frames/s")
+    print(f"speculative:        {speculative_fps:8.1f} frames/s ({speculative_fps / plain_fps:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
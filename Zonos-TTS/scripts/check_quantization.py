@@ -0,0 +1,112 @@
+"""
+Quality and speed check of `quantize="int8"` against the bfloat16 model.
+
+For each text, the bfloat16 model generates the reference codes. Both models then score those codes
+teacher-forced, which compares their next-frame distributions on the same context: top-1 agreement and
+KL(bf16 || int8) per codebook. Each model also generates from the same seed, to compare decode speed and
+output length, and the audio of both is written to --out-dir for listening.
+
+Run from the Zonos-TTS directory:
+
+    python -m scripts.check_quantization --device cpu --out-dir quantization_check
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import torch
+import torchaudio
+
+from zonos.codebook_pattern import apply_delay_pattern
+from zonos.conditioning import estimate_max_new_tokens, make_cond_dict
+from zonos.model import Zonos
+
+TEXTS = [
+    "안녕하세요. 오늘 면접을 진행하게 된 면접관입니다.",
+    "지원하신 직무와 관련해서 가장 자신 있는 경험을 말씀해 주세요.",
+    "마지막으로 하고 싶은 말씀이 있으신가요?",
+]
+
+
+def model_bytes(model: Zonos) -> int:
+    modules = (model.backbone, model.heads)
+    tensors = [t for m in modules for t in (*m.parameters(), *m.buffers())]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+@torch.inference_mode()
+def teacher_forced_logits(model: Zonos, conditioning: torch.Tensor, codes: torch.Tensor, cfg_scale: float):
+    """Logits `[1, 9, seq_len, vocab]` of every frame of `codes` given the frames before it."""
+    input_ids = apply_delay_pattern(codes, model.masked_token_id)[..., :-1]
+    with torch.device(model.device):
+        cache = model.setup_cache(conditioning.shape[0], conditioning.shape[1] + input_ids.shape[2])
+    embeds = model.embed_codes(input_ids).expand(conditioning.shape[0], -1, -1)
+    hidden_states = torch.cat([conditioning, embeds], dim=1)
+    return model._compute_logits(hidden_states, cache, cfg_scale, num_positions=input_ids.shape[2])[..., :1025]
+
+
+def timed_generate(model: Zonos, conditioning: torch.Tensor, max_new_tokens: int, cfg_scale: float, seed: int):
+    generator = torch.Generator(device=model.device).manual_seed(seed)
+    t0 = time.perf_counter()
+    codes = model.generate(
+        conditioning, max_new_tokens=max_new_tokens, cfg_scale=cfg_scale, progress_bar=False, generator=generator
+    )
+    if model.device.type == "cuda":
+        torch.cuda.synchronize()
+    return codes, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Zyphra/Zonos-v0.1-transformer")
+    parser.add_argument("--language", default="ko")
+    parser.add_argument("--cfg-scale", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--out-dir", type=Path, default=Path("quantization_check"))
+    args = parser.parse_args()
+
+    reference = Zonos.from_pretrained(args.model, device=args.device, backbone="torch")
+    quantized = Zonos.from_pretrained(args.model, device=args.device, backbone="torch", quantize="int8")
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    reference_mib, quantized_mib = model_bytes(reference) / 1024**2, model_bytes(quantized) / 1024**2
+    print(f"backbone + heads: bf16 {reference_mib:.0f} MiB, int8 {quantized_mib:.0f} MiB")
+    print(f"{'text':>4} {'top-1 agree':>12} {'KL':>8} {'bf16 frames/s':>14} {'int8 frames/s':>14} {'frames':>17}")
+
+    for i, text in enumerate(TEXTS):
+        cond_dict = make_cond_dict(text=text, language=args.language)
+        max_new_tokens = estimate_max_new_tokens(cond_dict)
+        conditioning = reference.prepare_conditioning(cond_dict)
+
+        # the first call of each model also compiles its decode step
+        if i == 0:
+            for model in (reference, quantized):
+                timed_generate(model, conditioning, max_new_tokens, args.cfg_scale, args.seed)
+
+        codes, reference_time = timed_generate(reference, conditioning, max_new_tokens, args.cfg_scale, args.seed)
+        quantized_codes, quantized_time = timed_generate(
+            quantized, conditioning, max_new_tokens, args.cfg_scale, args.seed
+        )
+
+        reference_logits = teacher_forced_logits(reference, conditioning, codes, args.cfg_scale)
+        quantized_logits = teacher_forced_logits(quantized, conditioning, codes, args.cfg_scale)
+        agree = (reference_logits.argmax(-1) == quantized_logits.argmax(-1)).float().mean().item()
+        kl = torch.nn.functional.kl_div(
+            quantized_logits.log_softmax(-1), reference_logits.log_softmax(-1), log_target=True, reduction="none"
+        )
+        kl = kl.sum(-1).mean().item()
+
+        for name, model_codes in (("bf16", codes), ("int8", quantized_codes)):
+            wav = reference.autoencoder.decode(model_codes).cpu()
+            torchaudio.save(args.out_dir / f"{i}_{name}.wav", wav[0], reference.autoencoder.sampling_rate)
+
+        print(
+            f"{i:>4} {agree * 100:>11.1f}% {kl:>8.4f} {codes.shape[-1] / reference_time:>14.1f} "
+            f"{quantized_codes.shape[-1] / quantized_time:>14.1f} {codes.shape[-1]:>8}/{quantized_codes.shape[-1]:<8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
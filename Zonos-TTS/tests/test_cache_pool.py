@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from zonos.cache_pool import InferenceCachePool  # noqa: E402
+from zonos.config import InferenceParams  # noqa: E402
+from zonos.utils import find_multiple  # noqa: E402
+
+
+class FakeModel:
+    """Allocates like `Zonos.setup_cache`, without a backbone."""
+
+    def __init__(self, block_size: int | None = None):
+        self.device = torch.device("cpu")
+        self.kv_pages = SimpleNamespace(block_size=block_size) if block_size else None
+        self.allocated = []
+
+    def cache_length(self, max_seqlen, kv_pages=None):
+        max_seqlen = find_multiple(max_seqlen, 8)
+        return find_multiple(max_seqlen, kv_pages.block_size) if kv_pages is not None else max_seqlen
+
+    def setup_cache(self, batch_size, max_seqlen, kv_pages=None):
+        max_seqlen = self.cache_length(max_seqlen, kv_pages)
+        self.allocated.append((batch_size, max_seqlen))
+        return InferenceParams(max_seqlen, batch_size, lengths_per_sample=torch.zeros(batch_size, dtype=torch.int32))
+
+
+@pytest.mark.parametrize("block_size", [None, 64, 1000])
+def test_released_cache_is_reused_at_its_allocated_length(block_size):
+    model = FakeModel(block_size)
+    pool = InferenceCachePool(model)
+    first = pool.acquire(2, 600)
+    assert model.allocated == [(2, first.max_seqlen)]
+    first.seqlen_offset = 123
+    pool.release(first)
+
+    second = pool.acquire(2, 700)  # same bucket
+    assert second is first
+    assert second.max_seqlen == model.allocated[0][1]
+    assert second.seqlen_offset == 0
+    assert (pool.hits, pool.misses) == (1, 1)
+
+
+def test_other_batch_sizes_and_buckets_get_their_own_caches():
+    model = FakeModel()
+    pool = InferenceCachePool(model)
+    pool.release(pool.acquire(2, 600))
+    pool.acquire(1, 600)
+    pool.acquire(2, 2000)
+    assert pool.misses == 3
+    assert model.allocated == [(2, 768), (1, 768), (2, 2048)]
+
+
+def test_keeps_at_most_max_free_per_bucket():
+    pool = InferenceCachePool(FakeModel(), max_free_per_bucket=1)
+    a, b = pool.acquire(2, 600), pool.acquire(2, 600)
+    pool.release(a)
+    pool.release(b)
+    assert pool.acquire(2, 600) is a
+    assert pool.acquire(2, 600) is not b
@@ -0,0 +1,60 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from torch import nn  # noqa: E402
+
+from zonos.codebooks import CodebookEmbedding, CodebookHeads  # noqa: E402
+
+NUM_CODEBOOKS, DIM = 9, 32
+
+
+class OldLayout(nn.Module):
+    """The original checkpoint layout: a `ModuleList` of one embedding / head per codebook."""
+
+    def __init__(self, head_vocab_size: int = 1025):
+        super().__init__()
+        self.embeddings = nn.ModuleList([nn.Embedding(1026, DIM) for _ in range(NUM_CODEBOOKS)])
+        self.heads = nn.ModuleList([nn.Linear(DIM, head_vocab_size, bias=False) for _ in range(NUM_CODEBOOKS)])
+
+    def embed_codes(self, codes: torch.Tensor) -> torch.Tensor:
+        return sum(emb(codes[:, i]) for i, emb in enumerate(self.embeddings))
+
+    def apply_heads(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        return torch.stack([head(hidden_states) for head in self.heads], dim=1)
+
+
+class NewLayout(nn.Module):
+    def __init__(self, head_vocab_size: int = 1025):
+        super().__init__()
+        self.embeddings = CodebookEmbedding(NUM_CODEBOOKS, 1026, DIM)
+        self.heads = CodebookHeads(NUM_CODEBOOKS, DIM, head_vocab_size)
+
+
+@pytest.mark.parametrize("head_vocab_size", [1025, 1032])  # unpadded, and padded like `pad_vocab_to_multiple_of=8`
+def test_loads_per_codebook_checkpoint(head_vocab_size):
+    torch.manual_seed(0)
+    old, new = OldLayout(), NewLayout(head_vocab_size)
+    state_dict = old.state_dict()
+    assert "embeddings.0.weight" in state_dict and "heads.8.weight" in state_dict
+    new.load_state_dict(state_dict)  # strict: every old key is consumed, every new one filled
+
+    codes = torch.randint(0, 1026, (2, NUM_CODEBOOKS, 5))
+    torch.testing.assert_close(new.embeddings(codes), old.embed_codes(codes))
+
+    hidden_states = torch.randn(2, 5, DIM)
+    logits = new.heads(hidden_states)
+    assert logits.shape == (2, NUM_CODEBOOKS, 5, head_vocab_size)
+    torch.testing.assert_close(logits[..., :1025], old.apply_heads(hidden_states))
+    assert (logits[..., 1025:] == 0).all()
+
+
+def test_loads_its_own_layout():
+    torch.manual_seed(0)
+    new = NewLayout()
+    state_dict = new.state_dict()
+    assert set(state_dict) == {"embeddings.weight", "heads.proj.weight"}
+    reloaded = NewLayout()
+    reloaded.load_state_dict(state_dict)
+    codes = torch.randint(0, 1026, (1, NUM_CODEBOOKS, 3))
+    torch.testing.assert_close(reloaded.embeddings(codes), new.embeddings(codes))
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("safetensors")
+
+from zonos.conditioning_cache import ConditioningCache, conditioning_key  # noqa: E402
+
+
+def conditioning(num_values: int = 256) -> torch.Tensor:
+    return torch.randn(2, 1, num_values)  # 2 KiB of float32 by default
+
+
+def test_conditioning_key_normalizes_text_only():
+    cond_dict = {"espeak": (["안녕하세요.  반갑습니다"], ["ko"]), "speaking_rate": torch.tensor([[[15.0]]])}
+    same = {"espeak": (["안녕하세요. 반갑습니다"], ["KO"]), "speaking_rate": torch.tensor([[[15.0]]])}
+    faster = {"espeak": (["안녕하세요. 반갑습니다"], ["ko"]), "speaking_rate": torch.tensor([[[20.0]]])}
+    assert conditioning_key(cond_dict) == conditioning_key(same)
+    assert conditioning_key(cond_dict) != conditioning_key(faster)
+    assert conditioning_key(cond_dict) != conditioning_key(cond_dict, {"espeak": (["x"], ["ko"])})
+
+
+def test_memory_lru_by_entries():
+    cache = ConditioningCache(max_entries=2)
+    a, b, c = conditioning(), conditioning(), conditioning()
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") is a  # a is now the most recently used
+    cache.put("c", c)
+    assert cache.get("b") is None
+    assert cache.get("a") is a and cache.get("c") is c
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_memory_lru_by_bytes():
+    cache = ConditioningCache(max_bytes=2 * 2048)
+    for key in "abc":
+        cache.put(key, conditioning())
+    assert cache.num_bytes == 2 * 2048
+    assert cache.get("a") is None
+    cache.put("huge", conditioning(4096))  # larger than the whole cache: not kept
+    assert cache.get("huge") is None
+
+
+def test_disk_round_trip(tmp_path):
+    value = conditioning()
+    ConditioningCache(cache_dir=tmp_path).put("a", value)
+    restarted = ConditioningCache(cache_dir=tmp_path)
+    assert torch.equal(restarted.get("a"), value)
+    assert restarted.get("missing") is None
+
+
+def test_disk_evicts_least_recently_used(tmp_path):
+    cache = ConditioningCache(cache_dir=tmp_path)
+    for i, key in enumerate("abc"):
+        cache.put(key, conditioning())
+        file_size = (tmp_path / f"{key}.safetensors").stat().st_size
+        os.utime(tmp_path / f"{key}.safetensors", (i, i))
+
+    restarted = ConditioningCache(cache_dir=tmp_path, max_disk_bytes=3 * file_size)
+    assert restarted.get("a") is not None  # read: a becomes the most recently used file
+    restarted.put("d", conditioning())
+    assert sorted(path.stem for path in tmp_path.glob("*.safetensors")) == ["a", "c", "d"]
+
+
+def test_concurrent_writes_of_one_key(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    value = conditioning()
+    caches = [ConditioningCache(cache_dir=tmp_path) for _ in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda cache: cache.put("a", value), caches))
+    assert [path.name for path in tmp_path.iterdir()] == ["a.safetensors"]
+    assert torch.equal(ConditioningCache(cache_dir=tmp_path).get("a"), value)
+
+
+def test_failed_write_is_only_logged(tmp_path, monkeypatch, caplog):
+    import zonos.conditioning_cache
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(zonos.conditioning_cache, "save_file", fail)
+    cache = ConditioningCache(cache_dir=tmp_path)
+    value = conditioning()
+    cache.put("a", value)
+    assert cache.get("a") is value  # still served from memory
+    assert list(tmp_path.iterdir()) == []
+    assert "Could not write" in caplog.text
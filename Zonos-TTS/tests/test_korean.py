@@ -0,0 +1,91 @@
+import pytest
+
+from zonos.korean import normalize_korean_text, read_native_korean, read_sino_korean
+
+
+@pytest.mark.parametrize(
+    "num, reading",
+    [
+        (0, "영"),
+        (1, "일"),
+        (10, "십"),
+        (15, "십오"),
+        (111, "백십일"),
+        (1000, "천"),
+        (2024, "이천이십사"),
+        (10000, "만"),
+        (11000, "만천"),
+        (20000, "이만"),
+        (100000000, "일억"),
+        (120000000, "일억이천만"),
+    ],
+)
+def test_read_sino_korean(num, reading):
+    assert read_sino_korean(num) == reading
+
+
+@pytest.mark.parametrize("num, reading", [(1, "한"), (2, "두"), (3, "세"), (4, "네"), (5, "다섯"), (10, "열"),
+                                          (20, "스무"), (21, "스물한"), (99, "아흔아홉")])  # fmt: skip
+def test_read_native_korean(num, reading):
+    assert read_native_korean(num) == reading
+
+
+@pytest.mark.parametrize(
+    "text, normalized",
+    [
+        ("3개", "세 개"),
+        ("3개를 골라 주세요", "세 개를 골라 주세요"),
+        ("3명이", "세 명이"),
+        ("21살입니다", "스물한 살입니다"),
+        ("3시 30분", "세 시 삼십분"),
+        ("2시간", "두 시간"),
+        ("1번째 질문", "첫 번째 질문"),
+        ("2번째", "두 번째"),
+        # counters that are only the start of a longer word
+        ("3개월", "삼 개월"),
+        ("6개월", "육 개월"),
+        ("1달러", "일 달러"),
+        ("100달러를", "백 달러를"),
+        ("3개발자", "삼개발자"),
+    ],
+)
+def test_counters(text, normalized):
+    assert normalize_korean_text(text) == normalized
+
+
+@pytest.mark.parametrize(
+    "text, normalized",
+    [
+        ("AWS를", "에이더블유에스를"),
+        ("EC2와 S3", "이씨투와 에스쓰리"),
+        ("APIs", "에이피아이스"),
+        ("URLs", "유알엘스"),
+        ("OAuth", "OAuth"),
+        ("iOS 개발", "iOS 개발"),
+        ("Python", "Python"),
+    ],
+)
+def test_acronyms(text, normalized):
+    assert normalize_korean_text(text) == normalized
+
+
+@pytest.mark.parametrize(
+    "text, normalized",
+    [
+        ("15분", "십오분"),
+        ("1,000원", "천원"),
+        ("3.14", "삼점일사"),
+        ("50%", "오십 퍼센트"),
+        ("2024년 6월 10일", "이천이십사년 유월 십일"),
+        ("10월", "시월"),
+        ("010-1234-5678", "공일공-일이삼사-오육칠팔"),
+        ("007", "공공칠"),
+    ],
+)
+def test_numbers(text, normalized):
+    assert normalize_korean_text(text) == normalized
+
+
+def test_text_without_numbers_or_capitals_is_unchanged():
+    text = "자기소개를 간단히 해 주세요."
+    assert normalize_korean_text(text) is text
@@ -0,0 +1,66 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from torch import nn  # noqa: E402
+
+from zonos.paged_cache import BlockTable, PagedKVCache  # noqa: E402
+
+
+class FakeBackbone(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(1))
+
+    def allocate_paged_cache(self, num_blocks, block_size, dtype=torch.bfloat16):
+        return {}
+
+
+def make_table(num_blocks=9, batch_size=2, max_seqlen=256, block_size=64):
+    kv_pages = PagedKVCache(FakeBackbone(), num_blocks, block_size=block_size)
+    return kv_pages, BlockTable(kv_pages, batch_size, max_seqlen)
+
+
+def test_reserve_allocates_pages_as_rows_grow():
+    kv_pages, table = make_table()
+    assert kv_pages.num_free_blocks == 8  # page 0 is reserved
+    table.reserve([0], 1)
+    table.reserve([0], 64)  # still within its first page
+    assert len(table.blocks[0]) == 1
+    table.reserve([0, 1], 65)
+    assert [len(blocks) for blocks in table.blocks] == [2, 2]
+    assert kv_pages.num_free_blocks == 4
+    for row, blocks in enumerate(table.blocks):
+        assert table.tensor[row, : len(blocks)].tolist() == blocks
+        assert (table.tensor[row, len(blocks) :] == 0).all()
+    assert 0 not in table.blocks[0] + table.blocks[1]
+    assert len(set(table.blocks[0] + table.blocks[1])) == 4
+
+
+def test_release_returns_pages():
+    kv_pages, table = make_table()
+    table.reserve([0, 1], 130)
+    assert kv_pages.num_free_blocks == 2
+    table.release([0])
+    assert kv_pages.num_free_blocks == 5
+    assert table.blocks[0] == [] and (table.tensor[0] == 0).all()
+    assert len(table.blocks[1]) == 3
+    table.reserve([0], 64)  # reuses freed pages
+    assert kv_pages.num_free_blocks == 4
+    table.release(range(2))
+    assert kv_pages.num_free_blocks == 8
+
+
+def test_out_of_pages():
+    kv_pages, table = make_table(num_blocks=4)
+    table.reserve([0], 128)
+    with pytest.raises(RuntimeError, match="Out of KV cache pages"):
+        table.reserve([1], 128)
+    assert table.blocks[1] == []
+    assert kv_pages.num_free_blocks == 1  # a failed allocation takes nothing
+
+
+def test_longer_than_table():
+    _, table = make_table(max_seqlen=128)
+    with pytest.raises(ValueError):
+        table.reserve([0], 129)
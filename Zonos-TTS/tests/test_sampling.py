@@ -0,0 +1,52 @@
+from functools import partial
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from zonos.sampling import FusedSampler, make_sampler, sample_from_logits  # noqa: E402
+
+
+def random_inputs(seed: int, bsz: int = 4, vocab: int = 1025):
+    generator = torch.Generator().manual_seed(seed)
+    logits = torch.randn(bsz, 9, vocab, generator=generator) * 3
+    # a window with repeats, so the penalty has to compound
+    generated_tokens = torch.randint(0, 8, (bsz, 9, 4), generator=generator)
+    return logits, generated_tokens
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        dict(min_p=0.1),
+        dict(min_p=0.1, temperature=0.7),
+        dict(temperature=1.3),
+        dict(min_p=0.05, repetition_penalty=1.0),
+        dict(min_p=0.1, repetition_penalty=1.5, repetition_penalty_window=4),
+    ],
+)
+@pytest.mark.parametrize("seed", range(5))
+def test_fused_sampler_matches_reference(params, seed):
+    logits, generated_tokens = random_inputs(seed)
+    expected = sample_from_logits(
+        logits.clone(), generated_tokens=generated_tokens, generator=torch.Generator().manual_seed(seed), **params
+    )
+    sampler = FusedSampler(**params)
+    for _ in range(2):  # again with the workspaces of the first call
+        tokens = sampler(logits.clone(), generated_tokens, generator=torch.Generator().manual_seed(seed))
+        assert torch.equal(tokens, expected)
+
+
+def test_fused_sampler_matches_reference_with_row_generators():
+    logits, generated_tokens = random_inputs(0)
+    generators = lambda: [torch.Generator().manual_seed(i) for i in range(logits.shape[0])]  # noqa: E731
+    expected = sample_from_logits(logits.clone(), min_p=0.1, generated_tokens=generated_tokens, generator=generators())
+    tokens = FusedSampler(min_p=0.1)(logits.clone(), generated_tokens, generator=generators())
+    assert torch.equal(tokens, expected)
+
+
+def test_make_sampler():
+    assert isinstance(make_sampler(dict(min_p=0.1)), FusedSampler)
+    for params in [dict(top_k=50), dict(temperature=0.0), dict(min_p=0.1, linear=0.5)]:
+        sampler = make_sampler(params)
+        assert isinstance(sampler, partial) and sampler.func is sample_from_logits
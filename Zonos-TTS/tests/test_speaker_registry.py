@@ -0,0 +1,67 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+
+from safetensors.torch import save_file  # noqa: E402
+
+from zonos.speaker_registry import SpeakerRegistry  # noqa: E402
+
+
+def store_embedding(store_dir, voice_id, digest="abc"):
+    store_dir.mkdir(parents=True, exist_ok=True)
+    embedding = torch.randn(1, 128).bfloat16()
+    save_file({"embedding": embedding}, store_dir / f"{voice_id}.safetensors", metadata={"source_sha256": digest})
+    return embedding
+
+
+def test_stored_voice_without_source(tmp_path):
+    embedding = store_embedding(tmp_path / "speakers", "stored")
+    registry = SpeakerRegistry(tmp_path / "speakers")
+    assert "stored" in registry
+    assert registry.digest("stored") == "abc"
+    assert torch.equal(registry.get("stored", device="cpu"), embedding)
+
+
+def test_configured_voice_with_missing_source_and_no_embedding(tmp_path):
+    registry = SpeakerRegistry(tmp_path / "speakers", {"missing": tmp_path / "missing.wav"})
+    assert "missing" not in registry
+    with pytest.raises(KeyError):
+        registry.digest("missing")
+
+
+def test_configured_voice_with_missing_source_but_stored_embedding(tmp_path):
+    store_embedding(tmp_path / "speakers", "default", digest="def")
+    registry = SpeakerRegistry(tmp_path / "speakers", {"default": tmp_path / "missing.wav"})
+    assert "default" in registry
+    assert registry.digest("default") == "def"
+
+
+@pytest.mark.parametrize("voice_id", [None, 3, ["default"], "", "../default", "a b"])
+def test_invalid_voice_ids(tmp_path, voice_id):
+    store_embedding(tmp_path / "speakers", "default")
+    assert voice_id not in SpeakerRegistry(tmp_path / "speakers")
+
+
+def test_concurrent_computes_of_one_voice(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import zonos.speaker_registry
+
+    class FakeSpeakerModel:
+        device = "cpu"
+
+        def __call__(self, wav, sr):
+            return None, torch.ones(128)
+
+    monkeypatch.setattr(zonos.speaker_registry.torchaudio, "load", lambda path: (torch.zeros(1, 16000), 16000))
+    source = tmp_path / "voice.wav"
+    source.write_bytes(b"audio")
+    registries = [SpeakerRegistry(tmp_path / "speakers", {"voice": source}) for _ in range(8)]
+    for registry in registries:  # separate registries, as in separate server processes
+        registry.spk_clone_model = FakeSpeakerModel()
+    with ThreadPoolExecutor(8) as pool:
+        embeddings = list(pool.map(lambda registry: registry.get("voice", device="cpu"), registries))
+    assert all(torch.equal(embedding, embeddings[0]) for embedding in embeddings)
+    assert [path.name for path in (tmp_path / "speakers").iterdir()] == ["voice.safetensors"]
+    assert SpeakerRegistry(tmp_path / "speakers").digest("voice") == registries[0].digest("voice")
@@ -0,0 +1,44 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from zonos.speculative import accept_draft  # noqa: E402
+
+
+def draws(probs: torch.Tensor, n: int, generator: torch.Generator) -> torch.Tensor:
+    """`n` independent draws `[n, 9, 1]` from the per-codebook distributions `probs` `[9, vocab]`."""
+    return torch.multinomial(probs, n, replacement=True, generator=generator).T.unsqueeze(-1)
+
+
+def test_same_distribution_is_always_accepted():
+    generator = torch.Generator().manual_seed(0)
+    probs = torch.softmax(torch.randn(4, 9, 16, generator=generator), dim=-1)
+    draft_tokens = draws(probs[0], 4, generator)
+    tokens, accepted = accept_draft(probs, probs.clone(), draft_tokens, generator=generator)
+    assert accepted.all()
+    assert torch.equal(tokens, draft_tokens)
+
+
+def test_impossible_draft_is_rejected():
+    generator = torch.Generator().manual_seed(0)
+    probs = torch.zeros(2, 9, 4)
+    probs[..., 1:] = 1 / 3
+    draft_probs = torch.zeros(2, 9, 4)
+    draft_probs[..., 0] = 1.0
+    draft_tokens = torch.zeros(2, 9, 1, dtype=torch.long)
+    tokens, accepted = accept_draft(probs, draft_probs, draft_tokens, generator=generator)
+    assert not accepted.any()
+    assert (tokens > 0).all()  # resampled from where the target has mass
+
+
+def test_output_follows_target_distribution():
+    generator = torch.Generator().manual_seed(0)
+    vocab, n = 6, 100_000
+    probs = torch.softmax(torch.randn(9, vocab, generator=generator) * 2, dim=-1)
+    draft_probs = torch.softmax(torch.randn(9, vocab, generator=generator) * 2, dim=-1)
+    draft_tokens = draws(draft_probs, n, generator)
+    tokens, _ = accept_draft(
+        probs.expand(n, -1, -1), draft_probs.expand(n, -1, -1), draft_tokens, generator=generator
+    )
+    frequencies = torch.nn.functional.one_hot(tokens[..., 0], vocab).float().mean(dim=0)
+    torch.testing.assert_close(frequencies, probs, atol=0.01, rtol=0)
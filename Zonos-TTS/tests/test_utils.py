@@ -0,0 +1,24 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from zonos.utils import bucket_length, find_multiple  # noqa: E402
+
+
+def test_find_multiple():
+    assert find_multiple(0, 8) == 0
+    assert find_multiple(9, 8) == 16
+    assert find_multiple(16, 8) == 16
+    assert find_multiple(5, 0) == 5
+
+
+def test_bucket_length_steps():
+    buckets = sorted({bucket_length(n) for n in range(1, 9000)})
+    assert buckets == [512, 768, 1024, 1536, 2048, 3072, 4096, 6144, 8192, 12288]
+
+
+def test_bucket_length_bounds():
+    for n in range(1, 9000, 7):
+        bucket = bucket_length(n)
+        assert n <= bucket and (bucket <= 512 or bucket < 1.5 * n + 1)
+        assert bucket % 256 == 0
@@ -1,4 +1,5 @@
 import math
+from typing import Iterator
 
 import torch
 import torchaudio
@@ -25,3 +26,109 @@ class DACAutoencoder:
     def decode(self, codes: torch.Tensor) -> torch.Tensor:
         with torch.autocast(self.dac.device.type, torch.float16, enabled=self.dac.device.type != "cpu"):
             return self.dac.decode(audio_codes=codes).audio_values.unsqueeze(1).float()
+
+    def decode_chunked(
+        self, codes: torch.Tensor, chunk_frames: int = 256, overlap_frames: int = 16
+    ) -> Iterator[torch.Tensor]:
+        """
+        Decodes codes `[bsz, 9, num_frames]` in windows of `chunk_frames` frames, each overlapping the
+        previous one by `overlap_frames`, and yields the waveform `[bsz, 1, num_samples]` as it's settled.
+        Overlaps are added with linear weights summing to 1, which fade out each window's edge. Peak memory
+        depends on the window size, not on the length of the audio.
+        """
+        assert 0 <= overlap_frames < chunk_frames
+        hop = self.dac.config.hop_length
+        num_frames = codes.shape[-1]
+        if num_frames == 0:
+            return
+        tail = None
+        for start in range(0, max(num_frames - overlap_frames, 1), chunk_frames - overlap_frames):
+            end = min(start + chunk_frames, num_frames)
+            wav = self.decode(codes[..., start:end])
+            if tail is not None:
+                n = tail.shape[-1]
+                fade_in = (torch.arange(n, device=wav.device) + 0.5) / n
+                wav[..., :n] = tail * (1 - fade_in) + wav[..., :n] * fade_in
+            if end == num_frames:
+                yield wav
+                return
+            split = (end - start - overlap_frames) * hop
+            tail = wav[..., split:]
+            yield wav[..., :split]
+
+    def decode_pcm16(
+        self, codes: list[torch.Tensor], chunk_frames: int = 256, overlap_frames: int = 16
+    ) -> list[torch.Tensor]:
+        """
+        Decodes utterances of different lengths, codes `[1, 9, num_frames]` each, as one right-padded batch
+        through `decode_chunked`, and returns their int16 PCM `[num_samples]` on the CPU. Each window is
+        converted on the device as it's decoded, so only int16 samples are copied and kept.
+        """
+        lengths = [c.shape[-1] for c in codes]
+        batch = torch.cat([torch.nn.functional.pad(c, (0, max(lengths) - c.shape[-1])) for c in codes])
+        chunks = [pcm16(wav[:, 0]).cpu() for wav in self.decode_chunked(batch, chunk_frames, overlap_frames)]
+        pcm = torch.cat(chunks, dim=-1) if chunks else torch.zeros((len(codes), 0), dtype=torch.int16)
+        hop = self.dac.config.hop_length
+        return [pcm[i, : n * hop] for i, n in enumerate(lengths)]
+
+
+def pcm16(wav: torch.Tensor) -> torch.Tensor:
+    """Float waveform in [-1, 1] -> int16 PCM samples of the same shape."""
+    return (wav.clamp(-1.0, 1.0) * 32767).round().to(torch.int16)
+
+
+class DACStreamDecoder:
+    """
+    Incrementally decodes codes pushed in arrival order into a seamless waveform.
+
+    Each push decodes a window made of up to `context_frames` already emitted frames, the new frames,
+    and `lookahead_frames` that are held back until the next push, so every emitted sample was decoded
+    with context on both sides. The first `crossfade_frames` of each chunk are crossfaded with the
+    previous window's decode of the same frames.
+    """
+
+    def __init__(
+        self,
+        autoencoder: DACAutoencoder,
+        context_frames: int = 12,
+        lookahead_frames: int = 6,
+        crossfade_frames: int = 2,
+    ):
+        assert crossfade_frames <= lookahead_frames, "The crossfade has to lie inside the held back lookahead"
+        self.autoencoder = autoencoder
+        self.context_frames = context_frames
+        self.lookahead_frames = lookahead_frames
+        self.crossfade_frames = crossfade_frames
+        self.hop_length = autoencoder.dac.config.hop_length
+
+        self._codes = None  # pushed codes from frame `self._first_frame` on
+        self._first_frame = 0
+        self._tail = None
+        self.num_frames = 0
+        self.emitted_frames = 0
+
+    def push(self, codes: torch.Tensor, final: bool = False) -> torch.Tensor:
+        """Append codes `[bsz, 9, n]` and return the waveform `[bsz, 1, num_samples]` that is now settled."""
+        self._codes = codes if self._codes is None else torch.cat([self._codes, codes], dim=-1)
+        self.num_frames += codes.shape[-1]
+        end = self.num_frames if final else self.num_frames - self.lookahead_frames
+        if end <= self.emitted_frames:
+            return torch.zeros((codes.shape[0], 1, 0), device=codes.device)
+
+        start = max(self._first_frame, self.emitted_frames - self.context_frames)
+        wav = self.autoencoder.decode(self._codes[..., start - self._first_frame :])
+        hop = self.hop_length
+        chunk = wav[..., (self.emitted_frames - start) * hop : (end - start) * hop]
+
+        if self._tail is not None:
+            n = min(self._tail.shape[-1], chunk.shape[-1])
+            fade_in = torch.linspace(0.0, 1.0, n, device=chunk.device)
+            chunk[..., :n] = self._tail[..., :n] * (1 - fade_in) + chunk[..., :n] * fade_in
+        self._tail = None if final else wav[..., (end - start) * hop : (end - start + self.crossfade_frames) * hop]
+        self.emitted_frames = end
+
+        # Only the context of the next window has to be kept around.
+        first_frame = max(self._first_frame, end - self.context_frames)
+        self._codes = self._codes[..., first_frame - self._first_frame :]
+        self._first_frame = first_frame
+        return chunk
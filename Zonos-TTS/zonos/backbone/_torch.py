@@ -39,19 +39,68 @@ def _update_kv_cache(
     # Adjust key and value for inference
     batch_start = inference_params.batch_size_offset
     batch_end = batch_start + k.shape[0]
+    if inference_params.block_table is not None:
+        return _update_paged_kv_cache(k, v, kv_cache, inference_params, batch_start, batch_end)
+    assert batch_end <= kv_cache.shape[0]
+    assert kv_cache is not None
+    if k.shape[1] == 1 and inference_params.lengths_per_sample is not None:
+        # Single-token decode: write each row at its own position, so rows of a batch may be at different lengths.
+        # The cache is returned up to `decode_window` (entries past each row's length are masked out), so that
+        # decode runs at the same shapes over many steps and doesn't depend on `seqlen_offset`.
+        batch_idx = torch.arange(batch_start, batch_end, device=k.device)
+        positions = inference_params.lengths_per_sample[batch_start:batch_end].long()
+        kv_cache[batch_idx, positions, 0, ...] = k[:, 0]
+        kv_cache[batch_idx, positions, 1, ...] = v[:, 0]
+        return kv_cache[batch_start:batch_end, : inference_params.decode_window]
     sequence_start = inference_params.seqlen_offset
     sequence_end = sequence_start + k.shape[1]
-    assert batch_end <= kv_cache.shape[0]
     assert sequence_end <= kv_cache.shape[1]
-    assert kv_cache is not None
     kv_cache[batch_start:batch_end, sequence_start:sequence_end, 0, ...] = k
     kv_cache[batch_start:batch_end, sequence_start:sequence_end, 1, ...] = v
     return kv_cache[batch_start:batch_end, :sequence_end, ...]
 
 
+def _update_paged_kv_cache(
+    k: torch.Tensor,
+    v: torch.Tensor,
+    pages: torch.Tensor,
+    inference_params: InferenceParams,
+    batch_start: int,
+    batch_end: int,
+) -> torch.Tensor:
+    """
+    Like `_update_kv_cache`, for the pages `[num_blocks, block_size, 2, nheads, head_dim]` of a `PagedKVCache`.
+    The rows' pages are gathered back into a dense `[batch_size, seqlen, 2, nheads, head_dim]` tensor for attention.
+    """
+    block_table = inference_params.block_table.tensor[batch_start:batch_end]
+    block_size = pages.shape[1]
+    decode = k.shape[1] == 1 and inference_params.lengths_per_sample is not None
+    if decode:
+        positions = inference_params.lengths_per_sample[batch_start:batch_end].long().unsqueeze(1)
+        seqlen = inference_params.decode_window
+    else:
+        sequence_start = inference_params.seqlen_offset
+        positions = torch.arange(sequence_start, sequence_start + k.shape[1], device=k.device).expand(k.shape[0], -1)
+        seqlen = sequence_start + k.shape[1]
+    blocks = block_table.gather(1, positions // block_size)
+    slots = positions % block_size
+    pages[blocks, slots, 0] = k
+    pages[blocks, slots, 1] = v
+    if seqlen is None:
+        return pages[block_table].flatten(1, 2)
+    # only gather the pages that are attended over
+    return pages[block_table[:, : -(-seqlen // block_size)]].flatten(1, 2)[:, :seqlen]
+
+
 class TorchZonosBackbone(nn.Module):
     supported_architectures = ["transformer"]
-    freqs_cis: torch.Tensor
+    # Single-token decode steps have the same shapes at every position of a given cache length and
+    # `decode_window`, so they can be compiled for those and captured in a CUDA graph.
+    static_decode = True
+    # Several tokens can be appended to a cache at a time, and a cache is rolled back by lowering its lengths,
+    # so this backbone can verify speculative drafts (see `zonos.speculative`).
+    multi_token_decode = True
+    freqs_cis: torch.Tensor | None = None
 
     def __init__(self, config: BackboneConfig):
         assert not config.ssm_cfg, "This backbone implementation only supports the Transformer model."
@@ -62,21 +111,45 @@ class TorchZonosBackbone(nn.Module):
         self.norm_f = nn.LayerNorm(config.d_model, eps=config.norm_epsilon)
 
     def allocate_inference_cache(self, batch_size: int, max_seqlen: int, dtype: torch.dtype = torch.bfloat16):
-        # TODO: This function should be pure
-        head_dim = self.config.d_model // self.config.attn_cfg["num_heads"]
-        self.freqs_cis = precompute_freqs_cis(16384, head_dim)
+        self._init_freqs_cis()
         return {
             i: layer.allocate_inference_cache(batch_size, max_seqlen, dtype=dtype)
             for i, layer in enumerate(self.layers)
         }
 
+    def allocate_paged_cache(self, num_blocks: int, block_size: int, dtype: torch.dtype = torch.bfloat16):
+        self._init_freqs_cis()
+        return {
+            i: layer.allocate_paged_cache(num_blocks, block_size, dtype=dtype) for i, layer in enumerate(self.layers)
+        }
+
+    def _init_freqs_cis(self):
+        if self.freqs_cis is None:
+            # Computed once, on the device of the first cache (allocated under `torch.device(model.device)`).
+            head_dim = self.config.d_model // self.config.attn_cfg["num_heads"]
+            self.freqs_cis = precompute_freqs_cis(16384, head_dim)
+
     def forward(self, hidden_states: torch.Tensor, inference_params: InferenceParams) -> torch.Tensor:
         input_pos = torch.arange(0, hidden_states.shape[1], device=hidden_states.device)
         input_pos = input_pos + inference_params.lengths_per_sample.unsqueeze(-1)
 
         freqs_cis = self.freqs_cis[input_pos].expand(hidden_states.shape[0], -1, -1, -1)
+
+        attn_mask = None
+        if hidden_states.shape[1] == 1:
+            # Attend over the cache up to `decode_window`, masking out entries past each row's own length (rows
+            # may be ragged, see `_update_kv_cache`).
+            num_keys = inference_params.decode_window or inference_params.max_seqlen
+            key_pos = torch.arange(num_keys, device=hidden_states.device)
+            attn_mask = (key_pos <= inference_params.lengths_per_sample.unsqueeze(-1)).view(-1, 1, 1, key_pos.shape[0])
+        elif inference_params.seqlen_offset > 0:
+            # Several tokens appended to a non-empty cache: each attends to the cache and to the new tokens up to
+            # itself. (`is_causal` would align the causal mask to the first key instead.)
+            key_pos = torch.arange(inference_params.seqlen_offset + hidden_states.shape[1], device=hidden_states.device)
+            attn_mask = (key_pos <= input_pos.unsqueeze(-1)).unsqueeze(1)
+
         for i, layer in enumerate(self.layers):
-            hidden_states = layer(hidden_states, inference_params, freqs_cis)
+            hidden_states = layer(hidden_states, inference_params, freqs_cis, attn_mask)
         return self.norm_f(hidden_states)
 
 
@@ -94,10 +167,20 @@ class TransformerBlock(nn.Module):
         self.head_dim = config.d_model // config.attn_cfg["num_heads"]
 
     def allocate_inference_cache(self, batch_size: int, max_seqlen: int, dtype: torch.dtype = torch.bfloat16):
-        return torch.empty(batch_size, max_seqlen, 2, self.num_heads_kv, self.head_dim, dtype=dtype), None
-
-    def forward(self, x: torch.Tensor, inference_params: InferenceParams, freqs_cis: torch.Tensor) -> torch.Tensor:
-        x = x + self.mixer(self.norm(x), inference_params, freqs_cis)
+        # Zeroed, since masked entries still enter the attention product in single-token decode
+        return torch.zeros(batch_size, max_seqlen, 2, self.num_heads_kv, self.head_dim, dtype=dtype), None
+
+    def allocate_paged_cache(self, num_blocks: int, block_size: int, dtype: torch.dtype = torch.bfloat16):
+        return torch.zeros(num_blocks, block_size, 2, self.num_heads_kv, self.head_dim, dtype=dtype), None
+
+    def forward(
+        self,
+        x: torch.Tensor,
+        inference_params: InferenceParams,
+        freqs_cis: torch.Tensor,
+        attn_mask: torch.Tensor | None = None,
+    ) -> torch.Tensor:
+        x = x + self.mixer(self.norm(x), inference_params, freqs_cis, attn_mask)
         x = x + self.mlp(self.norm2(x))
         return x
 
@@ -114,7 +197,13 @@ class Attention(nn.Module):
         self.in_proj = nn.Linear(config.d_model, total_head_dim, bias=False)
         self.out_proj = nn.Linear(self.num_heads * self.head_dim, config.d_model, bias=False)
 
-    def forward(self, x: torch.Tensor, inference_params: InferenceParams, freqs_cis: torch.Tensor) -> torch.Tensor:
+    def forward(
+        self,
+        x: torch.Tensor,
+        inference_params: InferenceParams,
+        freqs_cis: torch.Tensor,
+        attn_mask: torch.Tensor | None = None,
+    ) -> torch.Tensor:
         batch_size, seqlen, _ = x.shape
 
         q_size = self.num_heads * self.head_dim
@@ -133,7 +222,7 @@ class Attention(nn.Module):
 
         q, k, v = map(lambda x: x.transpose(1, 2), (q, k, v))
 
-        y = F.scaled_dot_product_attention(q, k, v, is_causal=seqlen > 1, enable_gqa=True)
+        y = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, is_causal=seqlen > 1 and attn_mask is None, enable_gqa=True)
 
         y = y.transpose(1, 2).contiguous().view(batch_size, seqlen, q_size)
 
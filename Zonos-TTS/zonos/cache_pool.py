@@ -0,0 +1,55 @@
+import threading
+from collections import defaultdict
+
+import torch
+
+from zonos.config import InferenceParams
+from zonos.utils import bucket_length
+
+
+class InferenceCachePool:
+    """
+    Reusable inference caches for `Zonos.generate` / `Zonos.stream`, instead of allocating a new one per call.
+
+    Caches are keyed by batch size and by the length `setup_cache` allocates for the max length rounded up to
+    a `bucket_length` (from `bucket_size` on), so requests of similar length share buffers. Up to
+    `max_free_per_bucket` released caches are kept per key. A reused cache is only reset
+    (`InferenceParams.reset`), not cleared: the prefill overwrites the state it reads.
+    """
+
+    def __init__(self, model, bucket_size: int = 512, max_free_per_bucket: int = 2):
+        self.model = model
+        self.bucket_size = bucket_size
+        self.max_free_per_bucket = max_free_per_bucket
+        self._free: dict[tuple[int, int], list[InferenceParams]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, batch_size: int, max_seqlen: int) -> InferenceParams:
+        max_seqlen = self.model.cache_length(bucket_length(max_seqlen, self.bucket_size), self.model.kv_pages)
+        key = (batch_size, max_seqlen)
+        with self._lock:
+            free = self._free[key]
+            inference_params = free.pop() if free else None
+            if inference_params is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if inference_params is None:
+            with torch.device(self.model.device):
+                return self.model.setup_cache(batch_size=key[0], max_seqlen=key[1], kv_pages=self.model.kv_pages)
+        inference_params.reset(key[1], key[0])
+        return inference_params
+
+    def release(self, inference_params: InferenceParams):
+        key = (inference_params.max_batch_size, inference_params.max_seqlen)
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.max_free_per_bucket:
+                free.append(inference_params)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
@@ -0,0 +1,69 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+def _stack_codebook_weights(state_dict: dict, prefix: str, num_codebooks: int, num_rows: int) -> torch.Tensor | None:
+    """
+    Pop the per-codebook weights `<prefix><i>.weight` of the original checkpoint layout (a `ModuleList` of one
+    layer per codebook) and concatenate them, each padded to `num_rows` rows. None if they're not there.
+    """
+    keys = [f"{prefix}{i}.weight" for i in range(num_codebooks)]
+    if not all(key in state_dict for key in keys):
+        return None
+    weights = [state_dict.pop(key) for key in keys]
+    return torch.cat([F.pad(w, (0, 0, 0, num_rows - w.shape[0])) for w in weights])
+
+
+class CodebookEmbedding(nn.Module):
+    """
+    The sum of one embedding per codebook, as a single table: codebook `k`'s rows start at `k * vocab_size`,
+    and a frame's codes are looked up and summed by one `embedding_bag`.
+    Loads the original `embeddings.<k>.weight` checkpoint layout.
+    """
+
+    def __init__(self, num_codebooks: int, vocab_size: int, dim: int):
+        super().__init__()
+        self.num_codebooks = num_codebooks
+        self.vocab_size = vocab_size
+        self.weight = nn.Parameter(torch.empty(num_codebooks * vocab_size, dim))
+        nn.init.normal_(self.weight)
+        self.register_buffer("offsets", torch.arange(num_codebooks) * vocab_size, persistent=False)
+        self._register_load_state_dict_pre_hook(self._load_codebook_weights)
+
+    def _load_codebook_weights(self, state_dict: dict, prefix: str, *args):
+        weight = _stack_codebook_weights(state_dict, prefix, self.num_codebooks, self.vocab_size)
+        if weight is not None:
+            state_dict[f"{prefix}weight"] = weight
+
+    def forward(self, codes: torch.Tensor) -> torch.Tensor:
+        """codes `[bsz, num_codebooks, seq_len]` -> `[bsz, seq_len, dim]`"""
+        bsz, _, seq_len = codes.shape
+        indices = (codes + self.offsets.view(1, -1, 1)).transpose(1, 2).reshape(bsz * seq_len, self.num_codebooks)
+        return F.embedding_bag(indices, self.weight, mode="sum").view(bsz, seq_len, -1)
+
+
+class CodebookHeads(nn.Module):
+    """
+    One linear head per codebook, as a single projection whose weight is `[num_codebooks, vocab_size, dim]`
+    flattened: all heads are one matmul. `vocab_size` may pad the checkpoint's heads; padded logits are 0.
+    Loads the original `heads.<k>.weight` checkpoint layout.
+    """
+
+    def __init__(self, num_codebooks: int, dim: int, vocab_size: int):
+        super().__init__()
+        self.num_codebooks = num_codebooks
+        self.vocab_size = vocab_size
+        # a plain `nn.Linear`, so that it can be quantized like the backbone's (see `quantize_int8_`)
+        self.proj = nn.Linear(dim, num_codebooks * vocab_size, bias=False)
+        self._register_load_state_dict_pre_hook(self._load_codebook_weights)
+
+    def _load_codebook_weights(self, state_dict: dict, prefix: str, *args):
+        weight = _stack_codebook_weights(state_dict, prefix, self.num_codebooks, self.vocab_size)
+        if weight is not None:
+            state_dict[f"{prefix}proj.weight"] = weight
+
+    def forward(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        """hidden_states `[bsz, seq_len, dim]` -> logits `[bsz, num_codebooks, seq_len, vocab_size]`"""
+        logits = self.proj(hidden_states).unflatten(-1, (self.num_codebooks, self.vocab_size))
+        return logits.transpose(1, 2)
@@ -1,10 +1,16 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from functools import cache
-from typing import Any, Literal, Iterable
+from multiprocessing import get_context
+from typing import Any, Callable, Literal, Iterable
 
 import torch
 import torch.nn as nn
 
 from zonos.config import PrefixConditionerConfig
+from zonos.korean import normalize_korean_text
 from zonos.utils import DEFAULT_DEVICE
 
 
@@ -127,6 +133,8 @@ def _expand_number(m: re.Match) -> str:
 
 
 def normalize_numbers(text: str) -> str:
+    if not _number_re.search(text):
+        return text
     text = re.sub(_comma_number_re, _remove_commas, text)
     text = re.sub(_pounds_re, r"\1 pounds", text)
     text = re.sub(_dollars_re, _expand_dollars, text)
@@ -175,15 +183,30 @@ def normalize_jp_text(text: str, tokenizer=Dictionary(dict="full").create()) ->
     return final_text
 
 
+_normalizers: dict[str, Callable[[str], str]] = {}
+
+
+def register_normalizer(language: str, normalizer: Callable[[str], str]):
+    """
+    Normalize texts of `language` with `normalizer` before phonemizing them. `language` is an eSpeak language
+    code, or a base language ("en") to cover all of its variants ("en-us", "en-gb"). Languages without a
+    normalizer get the English number expansion. Phonemizer worker processes only know the normalizers
+    registered when this module is imported.
+    """
+    _normalizers[language] = normalizer
+
+
+def get_normalizer(language: str) -> Callable[[str], str]:
+    return _normalizers.get(language) or _normalizers.get(language.split("-")[0], normalize_numbers)
+
+
+register_normalizer("en", normalize_numbers)
+register_normalizer("ja", normalize_jp_text)
+register_normalizer("ko", normalize_korean_text)
+
+
 def clean(texts: list[str], languages: list[str]) -> list[str]:
-    texts_out = []
-    for text, language in zip(texts, languages):
-        if "ja" in language:
-            text = normalize_jp_text(text)
-        else:
-            text = normalize_numbers(text)
-        texts_out.append(text)
-    return texts_out
+    return [get_normalizer(language)(text) for text, language in zip(texts, languages)]
 
 
 @cache
@@ -204,18 +227,101 @@ def get_backend(language: str) -> "EspeakBackend":
     return backend
 
 
+# eSpeak keeps global state, so calls into it are serialized within a process
+_espeak_lock = threading.Lock()
+
+PHONEME_CACHE_SIZE = 4096
+_phoneme_cache: OrderedDict[tuple[str, str], str] = OrderedDict()  # (text, language) -> phonemes, LRU
+_phoneme_cache_lock = threading.Lock()
+
+_phonemize_pool: ProcessPoolExecutor | None = None
+_phonemize_workers = 0
+
+
+def set_phonemize_workers(num_workers: int):
+    """
+    Phonemize cache misses in `num_workers` processes, each with its own eSpeak, when a call has several of
+    them (0, the default, phonemizes in the calling process).
+    """
+    global _phonemize_pool, _phonemize_workers
+    if _phonemize_pool is not None:
+        _phonemize_pool.shutdown()
+        _phonemize_pool = None
+    _phonemize_workers = num_workers
+    if num_workers > 0:
+        # spawned, not forked: the parent may hold CUDA state and other threads' locks
+        _phonemize_pool = ProcessPoolExecutor(num_workers, mp_context=get_context("spawn"))
+
+
+def _phonemize_batch(texts: list[str], language: str) -> list[str]:
+    """Phonemize texts of one language in a single eSpeak backend call."""
+    texts = clean(texts, [language] * len(texts))
+    backend = get_backend(language)
+    with _espeak_lock:
+        return backend.phonemize(texts, strip=True)
+
+
 def phonemize(texts: list[str], languages: list[str]) -> list[str]:
-    texts = clean(texts, languages)
+    """
+    Phonemes of each text. Results are cached by (text, language); misses are phonemized in one batch per
+    language, split across the worker processes of `set_phonemize_workers` if there are any.
+    """
+    batch_phonemes = [None] * len(texts)
+    misses: dict[str, dict[str, list[int]]] = {}  # language -> text -> indices
+    with _phoneme_cache_lock:
+        for i, (text, language) in enumerate(zip(texts, languages)):
+            phonemes = _phoneme_cache.get((text, language))
+            if phonemes is None:
+                misses.setdefault(language, {}).setdefault(text, []).append(i)
+            else:
+                _phoneme_cache.move_to_end((text, language))
+                batch_phonemes[i] = phonemes
+
+    pool = _phonemize_pool
+    for language, indices in misses.items():
+        miss_texts = list(indices)
+        if pool is not None and len(miss_texts) > 1:
+            chunk_size = -(-len(miss_texts) // _phonemize_workers)
+            chunks = [miss_texts[i : i + chunk_size] for i in range(0, len(miss_texts), chunk_size)]
+            futures = [pool.submit(_phonemize_batch, chunk, language) for chunk in chunks]
+            miss_phonemes = [phonemes for future in futures for phonemes in future.result()]
+        else:
+            miss_phonemes = _phonemize_batch(miss_texts, language)
 
-    batch_phonemes = []
-    for text, language in zip(texts, languages):
-        backend = get_backend(language)
-        phonemes = backend.phonemize([text], strip=True)
-        batch_phonemes.append(phonemes[0])
+        with _phoneme_cache_lock:
+            for text, phonemes in zip(miss_texts, miss_phonemes):
+                for i in indices[text]:
+                    batch_phonemes[i] = phonemes
+                _phoneme_cache[(text, language)] = phonemes
+                _phoneme_cache.move_to_end((text, language))
+            while len(_phoneme_cache) > PHONEME_CACHE_SIZE:
+                _phoneme_cache.popitem(last=False)
 
     return batch_phonemes
 
 
+def estimate_max_new_tokens(
+    cond_dict: dict,
+    safety_factor: float = 2.0,
+    min_tokens: int = 86 * 2,
+    max_tokens: int = 86 * 60,
+    frame_rate: int = 86,
+) -> int:
+    """
+    Upper bound on the frames needed to speak the text of `cond_dict` at its `speaking_rate` (phonemes per
+    second), for sizing `max_new_tokens` (and with it the inference cache) to the utterance instead of to
+    the longest possible one. Generation still stops at EOS, usually well before this bound.
+    """
+    speaking_rate = cond_dict.get("speaking_rate")
+    if speaking_rate is None:
+        return max_tokens
+    speaking_rate = float(torch.as_tensor(speaking_rate).flatten()[0])
+    texts, languages = cond_dict["espeak"]
+    num_phonemes = max(len(phonemes) for phonemes in phonemize(texts, languages))
+    num_tokens = num_phonemes / max(speaking_rate, 1.0) * frame_rate * safety_factor
+    return int(min(max(num_tokens, min_tokens), max_tokens))
+
+
 class EspeakPhonemeConditioner(Conditioner):
     def __init__(self, output_dim: int, **kwargs):
         super().__init__(output_dim, **kwargs)
@@ -301,16 +407,60 @@ class PrefixConditioner(Conditioner):
         self.norm = nn.LayerNorm(output_dim)
         self.required_keys = {c.name for c in self.conditioners if c.uncond_vector is None}
 
-    def forward(self, cond_dict: dict) -> torch.Tensor:
-        if not set(cond_dict).issuperset(self.required_keys):
-            raise ValueError(f"Missing required keys: {self.required_keys - set(cond_dict)}")
-        conds = []
-        for conditioner in self.conditioners:
-            conds.append(conditioner(cond_dict.get(conditioner.name)))
+    def forward(self, cond_dict: dict, precomputed: dict[str, torch.Tensor] | None = None) -> torch.Tensor:
+        """`precomputed` holds outputs of `precompute`, used in place of those conditioners'."""
+        precomputed = precomputed or {}
+        missing = self.required_keys - set(cond_dict) - set(precomputed)
+        if missing:
+            raise ValueError(f"Missing required keys: {missing}")
+        if not precomputed:
+            conds = self._expand([conditioner(cond_dict.get(conditioner.name)) for conditioner in self.conditioners])
+            return self.norm(self.project(torch.cat(conds, dim=-2)))
+
+        conds = [
+            precomputed[conditioner.name] if conditioner.name in precomputed else self._condition(conditioner, cond_dict)
+            for conditioner in self.conditioners
+        ]
+        return torch.cat(self._expand(conds), dim=-2)
+
+    def precompute(self, cond_dict: dict, exclude: Iterable[str] = ("espeak",)) -> dict[str, torch.Tensor]:
+        """
+        Outputs of the conditioners not in `exclude`, projected and normalized. Both act on each position on
+        its own, so `forward` can join these with the other conditioners' outputs as they come.
+        """
+        return {
+            conditioner.name: self._condition(conditioner, cond_dict).detach()
+            for conditioner in self.conditioners
+            if conditioner.name not in exclude
+        }
+
+    def _condition(self, conditioner: Conditioner, cond_dict: dict) -> torch.Tensor:
+        return self.norm(self.project(conditioner(cond_dict.get(conditioner.name))))
+
+    @staticmethod
+    def _expand(conds: list[torch.Tensor]) -> list[torch.Tensor]:
         max_bsz = max(map(len, conds))
         assert all(c.shape[0] in (max_bsz, 1) for c in conds)
-        conds = [c.expand(max_bsz, -1, -1) for c in conds]
-        return self.norm(self.project(torch.cat(conds, dim=-2)))
+        return [c.expand(max_bsz, -1, -1) for c in conds]
+
+
+@dataclass
+class ConditioningPreset:
+    """
+    A fixed set of conditioning values (speaker, emotion, speaking rate, ...) with the prefix conditioner
+    outputs of everything but the text already computed, for the cond and uncond rows. See
+    `Zonos.make_preset`.
+    """
+
+    cond_dict: dict  # the `make_cond_dict` output it was made from
+    cond: dict[str, torch.Tensor]
+    uncond: dict[str, torch.Tensor]
+    key: str  # `conditioning_key` of `cond_dict` without its text
+
+    def make_cond_dict(self, text: str) -> dict:
+        """`cond_dict` with `text` in place of its text, in the same language."""
+        _, languages = self.cond_dict["espeak"]
+        return {**self.cond_dict, "espeak": ([text], languages)}
 
 
 supported_language_codes = [
@@ -326,6 +476,8 @@ supported_language_codes = [
     'vi-vn-x-central', 'vi-vn-x-south', 'yue'
 ]  # fmt: off
 
+language_code_to_id = {lang: i for i, lang in enumerate(supported_language_codes)}
+
 
 def make_cond_dict(
     text: str = "It would be nice to have time for testing, indeed.",
@@ -374,8 +526,6 @@ def make_cond_dict(
     """
     assert language.lower() in supported_language_codes, "Please pick a supported language"
 
-    language_code_to_id = {lang: i for i, lang in enumerate(supported_language_codes)}
-
     cond_dict = {
         "espeak": ([text], [language]),
         "speaker": speaker,
@@ -395,7 +545,7 @@ def make_cond_dict(
 
     for k, v in cond_dict.items():
         if isinstance(v, (float, int, list)):
-            v = torch.tensor(v)
+            v = torch.tensor(v, device=device)
         if isinstance(v, torch.Tensor):
             cond_dict[k] = v.view(1, 1, -1).to(device)
 
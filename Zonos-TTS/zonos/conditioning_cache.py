@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+from safetensors.torch import load_file, save_file
+
+logger = logging.getLogger(__name__)
+
+
+def conditioning_key(cond_dict: dict, uncond_dict: dict | None = None) -> str:
+    """Stable hash of the inputs of `Zonos.prepare_conditioning`."""
+    h = hashlib.sha256()
+    for name, d in (("cond", cond_dict), ("uncond", uncond_dict)):
+        h.update(name.encode())
+        if d is None:
+            continue
+        for k in sorted(d):
+            v = d[k]
+            h.update(k.encode())
+            if isinstance(v, torch.Tensor):
+                v = v.detach().cpu().contiguous()
+                h.update(f"{v.dtype}{tuple(v.shape)}".encode())
+                h.update(v.view(torch.uint8).numpy().tobytes() if v.dtype == torch.bfloat16 else v.numpy().tobytes())
+            elif k == "espeak":
+                texts, languages = v
+                texts = [unicodedata.normalize("NFC", " ".join(text.split())) for text in texts]
+                h.update(repr((texts, [language.lower() for language in languages])).encode())
+            else:
+                h.update(repr(v).encode())
+    return h.hexdigest()
+
+
+class ConditioningCache:
+    """
+    LRU cache of `prepare_conditioning` outputs, bounded by number of entries and total bytes.
+
+    With `cache_dir`, every entry is also written as `<key>.safetensors` and read back on a miss,
+    so repeated lines survive restarts. Files are kept to `max_disk_bytes`, least recently used
+    (by mtime, refreshed on every read) first out.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 512 * 1024**2,
+        cache_dir: str | Path | None = None,
+        max_disk_bytes: int = 1024**3,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries: OrderedDict[str, torch.Tensor] = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, device: torch.device | str | None = None) -> torch.Tensor | None:
+        with self._lock:
+            conditioning = self._entries.get(key)
+            if conditioning is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return conditioning
+
+        path = self._path(key)
+        try:
+            if path is None:
+                raise FileNotFoundError
+            conditioning = load_file(path, device=str(device or "cpu"))["conditioning"]
+            os.utime(path)
+        except FileNotFoundError:  # also when evicted since
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._insert(key, conditioning)
+        return conditioning
+
+    def put(self, key: str, conditioning: torch.Tensor):
+        self._insert(key, conditioning)
+        path = self._path(key)
+        if path is not None and not path.exists():
+            try:
+                self._write_file(path, conditioning)
+            except Exception:  # the entry is still cached in memory, the disk copy is only for restarts
+                logger.warning("Could not write %s", path, exc_info=True)
+                return
+            self._evict_files()
+
+    def _write_file(self, path: Path, conditioning: torch.Tensor):
+        # a temporary file of its own per writer, so that concurrent misses of the same key never share one
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_path = Path(f.name)
+        try:
+            save_file({"conditioning": conditioning.contiguous()}, tmp_path)
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def _insert(self, key: str, conditioning: torch.Tensor):
+        size = self._nbytes(conditioning)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.num_bytes -= self._nbytes(self._entries.pop(key))
+            self._entries[key] = conditioning
+            self.num_bytes += size
+            while len(self._entries) > self.max_entries or self.num_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.num_bytes -= self._nbytes(evicted)
+
+    def _evict_files(self):
+        with self._lock:
+            files = []
+            for path in self.cache_dir.glob("*.safetensors"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_disk_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def _path(self, key: str) -> Path | None:
+        return None if self.cache_dir is None else self.cache_dir / f"{key}.safetensors"
+
+    @staticmethod
+    def _nbytes(t: torch.Tensor) -> int:
+        return t.numel() * t.element_size()
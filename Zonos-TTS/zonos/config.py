@@ -1,8 +1,11 @@
 from dataclasses import dataclass, field
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import torch
 
+if TYPE_CHECKING:
+    from zonos.paged_cache import BlockTable
+
 
 # https://github.com/state-spaces/mamba/blob//mamba_ssm/utils/generation.py#L18
 @dataclass
@@ -16,13 +19,66 @@ class InferenceParams:
     batch_size_offset: int = 0
     key_value_memory_dict: dict = field(default_factory=dict)
     lengths_per_sample: torch.Tensor | None = None
+    # Set when the KV cache is paged: `key_value_memory_dict` then holds the pages of a `PagedKVCache`
+    block_table: "BlockTable | None" = None
+    # Number of cache positions that single-token decode attends over (all of them if None). Must exceed
+    # every row's length; kept to a few `bucket_length`s, since each value is a shape to compile for.
+    decode_window: int | None = None
 
     def reset(self, max_seqlen, max_batch_size):
         self.max_seqlen = max_seqlen
         self.max_batch_size = max_batch_size
         self.seqlen_offset = 0
+        self.decode_window = None
         if self.lengths_per_sample is not None:
             self.lengths_per_sample.zero_()
+        self.free_blocks()
+
+    def reserve(self, num_tokens: int, rows: list[int] | None = None):
+        """Make room for `num_tokens` cached tokens in `rows` (all by default). Only paged caches allocate."""
+        if self.block_table is not None:
+            self.block_table.reserve(range(self.max_batch_size) if rows is None else rows, num_tokens)
+
+    def free_blocks(self, rows: list[int] | None = None):
+        """Return the pages of `rows` (all by default) of a paged cache to its pool."""
+        if self.block_table is not None:
+            self.block_table.release(range(self.max_batch_size) if rows is None else rows)
+
+    def copy_rows_(
+        self, src: "InferenceParams", dst_rows: list[int], src_rows: list[int], num_tokens: int | None = None
+    ):
+        """
+        Copy the per-sample cache state (KV and/or SSM) of `src_rows` in `src` into `dst_rows` of this cache.
+        `num_tokens`, the number of tokens cached in `src_rows`, is required when this cache is paged.
+        """
+        if self.block_table is not None:
+            self._copy_rows_to_pages(src, dst_rows, src_rows, num_tokens)
+            return
+        for layer_idx, dst_cache in self.key_value_memory_dict.items():
+            src_cache = src.key_value_memory_dict[layer_idx]
+            if isinstance(dst_cache, torch.Tensor):
+                dst_cache, src_cache = (dst_cache,), (src_cache,)
+            for dst_state, src_state in zip(dst_cache, src_cache):
+                if dst_state is None:
+                    continue
+                if dst_state.shape[1:] == src_state.shape[1:]:
+                    dst_state[dst_rows] = src_state[src_rows]
+                else:  # KV cache of a shorter `src`
+                    dst_state[dst_rows, : src_state.shape[1]] = src_state[src_rows]
+        if self.lengths_per_sample is not None:
+            self.lengths_per_sample[dst_rows] = src.lengths_per_sample[src_rows]
+
+    def _copy_rows_to_pages(self, src: "InferenceParams", dst_rows: list[int], src_rows: list[int], num_tokens: int):
+        self.free_blocks(dst_rows)
+        self.reserve(num_tokens, dst_rows)
+        block_size = self.block_table.block_size
+        positions = torch.arange(num_tokens, device=self.block_table.tensor.device)
+        for dst_row, src_row in zip(dst_rows, src_rows):
+            blocks = self.block_table.tensor[dst_row, positions // block_size]
+            for layer_idx, (pages, _) in self.key_value_memory_dict.items():
+                src_kv, _ = src.key_value_memory_dict[layer_idx]
+                pages[blocks, positions % block_size] = src_kv[src_row, :num_tokens]
+        self.lengths_per_sample[dst_rows] = src.lengths_per_sample[src_rows]
 
 
 @dataclass
@@ -0,0 +1,374 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import torch
+
+from zonos.codebook_pattern import apply_delay_pattern, revert_delay_pattern
+from zonos.model import Zonos
+from zonos.paged_cache import PagedKVCache
+from zonos.sampling import make_sampler
+from zonos.utils import bucket_length
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationFuture(Future):
+    """Future of a submitted utterance. Once done, `truncated` tells whether it was cut at `max_new_tokens`."""
+
+    def __init__(self):
+        super().__init__()
+        self.truncated = False
+
+
+@dataclass
+class _Request:
+    prefix_conditioning: torch.Tensor  # [num_rows, cond_seq_len, d_model]
+    max_new_tokens: int
+    generator: torch.Generator | None = None
+    future: GenerationFuture = field(default_factory=GenerationFuture)
+    frames: queue.Queue | None = None  # settled codes `[1, 9, n]` for `stream`, in order
+    chunk_frames: int = 0
+    emitted_frames: int = 0
+    abandoned: bool = False  # the `stream` consumer went away
+
+
+class ContinuousBatchingEngine:
+    """
+    Serves many concurrent `generate` calls from one continuously refilled decode batch.
+
+    The engine owns `max_batch_size` slots of a single inference cache (two rows per slot for CFG, one
+    with `cfg_scale=1.0`).
+    A background thread admits queued requests into free slots at frame boundaries, by prefilling
+    them in a private scratch cache and copying that state into the slot, then decodes one frame for
+    the whole batch. A sequence leaves the batch once its EOS delay tail (9 frames after EOS in
+    codebook 0) is complete, and its slot is reused by the next request.
+
+    Rows of the shared cache sit at different lengths, so the backbone has to honour per-row decode
+    positions in `InferenceParams.lengths_per_sample` (the torch backbone, or mamba_ssm with flash-attn).
+
+    With `kv_pages` (torch backbone), the shared cache is paged: a slot only holds the KV pages its sequence
+    has reached, so `max_batch_size` can be raised well beyond what dense `max_seqlen` rows would allow.
+    """
+
+    def __init__(
+        self,
+        model: Zonos,
+        max_batch_size: int = 8,
+        max_prefix_len: int = 1024,
+        max_new_tokens: int = 86 * 60,
+        cfg_scale: float = 2.0,
+        sampling_params: dict | None = None,
+        kv_pages: PagedKVCache | None = None,
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_prefix_len = max_prefix_len
+        self.max_new_tokens = max_new_tokens
+        self.cfg_scale = cfg_scale
+        if sampling_params is None:
+            sampling_params = dict(min_p=0.1)
+        self.sampling_params = sampling_params
+        # separate samplers for the prefill and decode shapes, so that each keeps its workspaces
+        self._prefill_sample = make_sampler(sampling_params)
+        self._sample = make_sampler(sampling_params)
+        self.num_rows = 1 if cfg_scale == 1.0 else 2
+        self.kv_pages = kv_pages
+
+        self._queue: queue.Queue[_Request | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._slots: list[_Request | None] = [None] * max_batch_size
+        self.num_truncated = 0  # requests that reached their max_new_tokens without EOS
+
+        self._cache = None
+        self._scratch = None
+
+    def submit(
+        self,
+        prefix_conditioning: torch.Tensor,
+        max_new_tokens: int | None = None,
+        generator: torch.Generator | None = None,
+    ) -> GenerationFuture:
+        """
+        Queue one utterance's `[cond, uncond]` conditioning; the future resolves to codes `[1, 9, seq_len]`.
+        With `generator` (on the model's device), the request samples only from it.
+        A sequence without EOS after `max_new_tokens` frames is cut there and flagged `future.truncated`.
+        """
+        request = self._request(prefix_conditioning, max_new_tokens, generator)
+        self._enqueue(request)
+        return request.future
+
+    def stream(
+        self,
+        prefix_conditioning: torch.Tensor,
+        max_new_tokens: int | None = None,
+        generator: torch.Generator | None = None,
+        chunk_frames: int = 24,
+    ) -> Iterator[torch.Tensor]:
+        """
+        Like `submit`, but yields the codes `[1, 9, n]` as they settle, every `chunk_frames` frames, while the
+        utterance decodes in the shared batch. Concatenating the chunks gives the codes `generate` returns.
+        """
+        request = self._request(
+            prefix_conditioning, max_new_tokens, generator, frames=queue.Queue(), chunk_frames=chunk_frames
+        )
+        request.future.add_done_callback(lambda _: request.frames.put(None))
+        self._enqueue(request)
+
+        num_frames = 0
+        try:
+            while (codes := request.frames.get()) is not None:
+                num_frames += codes.shape[-1]
+                yield codes
+            # the rest of the utterance, up to its EOS (raises if the request failed)
+            yield request.future.result()[..., num_frames:]
+        finally:
+            # a consumer that stops early (a closed connection) gives up its queue place or its slot
+            request.abandoned = True
+            request.future.cancel()
+
+    def _request(
+        self,
+        prefix_conditioning: torch.Tensor,
+        max_new_tokens: int | None,
+        generator: torch.Generator | None,
+        **fields,
+    ) -> _Request:
+        if prefix_conditioning.shape[0] != 2:
+            raise ValueError("Expected the conditioning of a single utterance, as returned by `prepare_conditioning`")
+        prefix_conditioning = prefix_conditioning[: self.num_rows]  # without CFG only the cond row is used
+        if prefix_conditioning.shape[1] > self.max_prefix_len:
+            raise ValueError(f"Conditioning is longer than max_prefix_len={self.max_prefix_len}")
+        if max_new_tokens is None:
+            max_new_tokens = self.max_new_tokens
+        return _Request(prefix_conditioning, min(max_new_tokens, self.max_new_tokens), generator, **fields)
+
+    def _enqueue(self, request: _Request):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Engine is closed")
+            if self._thread is None:
+                self._setup()
+                self._thread = threading.Thread(target=self._run, name="zonos-batching", daemon=True)
+                self._thread.start()
+            self._queue.put(request)
+
+    def generate(
+        self,
+        prefix_conditioning: torch.Tensor,
+        max_new_tokens: int | None = None,
+        generator: torch.Generator | None = None,
+    ) -> torch.Tensor:
+        return self.submit(prefix_conditioning, max_new_tokens, generator).result()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queue.put(None)
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _setup(self):
+        bsz = self.max_batch_size
+        max_seqlen = self.max_prefix_len + self.max_new_tokens + 9
+        with torch.device(self.model.device):
+            self._cache = self.model.setup_cache(
+                batch_size=bsz * self.num_rows, max_seqlen=max_seqlen, kv_pages=self.kv_pages
+            )
+            self._scratch = self.model.setup_cache(batch_size=self.num_rows, max_seqlen=max_seqlen)
+            # one spare frame: the last decode step of a full-length sequence writes past its delayed codes
+            self._codes = torch.full((bsz, 9, self.max_new_tokens + 10), self.model.masked_token_id)
+            self._pos = torch.ones(bsz, dtype=torch.long)
+            self._remaining = torch.zeros(bsz, dtype=torch.long)
+            self._stopping = torch.zeros(bsz, dtype=torch.bool)
+            self._active = torch.zeros(bsz, dtype=torch.bool)
+        self._lengths = [0] * bsz  # host copy of each slot's cache length, avoids syncing for `seqlen_offset`
+        self._logit_bias = None
+        # The batch always has `max_batch_size` slots, so a static-shape decode step compiles once per
+        # `decode_window` bucket (a handful over a whole utterance).
+        if getattr(self.model.backbone, "static_decode", False):
+            self._decode_one_token = self.model.compiled_decode_one_token()
+        else:
+            self._decode_one_token = self.model._decode_one_token
+
+    @torch.inference_mode()
+    def _run(self):
+        while True:
+            if not self._admit_pending():
+                break
+            if not any(self._slots):
+                continue
+            try:
+                self._step()
+            except Exception as e:
+                for slot, request in enumerate(self._slots):
+                    if request is not None:
+                        self._release(slot)
+                        request.future.set_exception(e)
+
+        for slot, request in enumerate(self._slots):
+            if request is not None:
+                request.future.set_exception(RuntimeError("Engine was closed"))
+
+    def _admit_pending(self) -> bool:
+        """Fill free slots from the queue, blocking only when the batch is empty. Returns False once closed."""
+        while None in self._slots:
+            try:
+                request = self._queue.get(block=not any(self._slots))
+            except queue.Empty:
+                return True
+            if request is None:
+                return False
+            if not request.future.set_running_or_notify_cancel():
+                continue
+
+            slot = self._slots.index(None)
+            try:
+                self._admit(request, slot)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+            self._slots[slot] = request
+        return True
+
+    def _admit(self, request: _Request, slot: int):
+        model = self.model
+        device = model.device
+        scratch = self._scratch
+        scratch.reset(scratch.max_seqlen, scratch.max_batch_size)
+
+        codes = torch.full((1, 9, request.max_new_tokens), -1, device=device)
+        delayed_codes = apply_delay_pattern(codes, model.masked_token_id)
+
+        prefix_conditioning = request.prefix_conditioning.to(device)
+        logits = model._prefill(prefix_conditioning, delayed_codes[..., :1], scratch, self.cfg_scale)
+        next_token = self._prefill_sample(logits, generator=request.generator)
+        frame = delayed_codes[..., 1:2]
+        frame.copy_(torch.where(frame == -1, next_token, frame))
+
+        prefix_length = prefix_conditioning.shape[1] + 1
+        rows = self._rows(slot)
+        self._cache.copy_rows_(scratch, rows, list(range(self.num_rows)), prefix_length)
+        self._cache.lengths_per_sample[rows] = prefix_length
+        self._lengths[slot] = prefix_length
+
+        self._codes[slot].fill_(model.masked_token_id)
+        self._codes[slot, :, : delayed_codes.shape[2]] = delayed_codes[0]
+        self._pos[slot] = 2
+        self._remaining[slot] = delayed_codes.shape[2] - 1
+        self._stopping[slot] = False
+        self._active[slot] = True
+
+    def _release(self, slot: int):
+        self._slots[slot] = None
+        self._active[slot] = False
+        self._pos[slot] = 1
+        self._lengths[slot] = 0
+        self._cache.lengths_per_sample[self._rows(slot)] = 0
+        self._cache.free_blocks(self._rows(slot))
+
+    def _rows(self, slot: int) -> list[int]:
+        """Cache rows of `slot`: its cond row, and its uncond row `max_batch_size` further down with CFG."""
+        return [slot + i * self.max_batch_size for i in range(self.num_rows)]
+
+    def _step(self):
+        model = self.model
+        bsz = self.max_batch_size
+        eos_token_id, masked_token_id = model.eos_token_id, model.masked_token_id
+        cache = self._cache
+        for slot, request in enumerate(self._slots):
+            if request is None:
+                continue
+            if request.abandoned:
+                self._release(slot)
+                request.future.set_exception(RuntimeError("Stream was closed"))
+                continue
+            try:
+                cache.reserve(self._lengths[slot] + 1, self._rows(slot))
+            except RuntimeError as e:  # out of KV pages: fail this request, not the whole batch
+                self._release(slot)
+                request.future.set_exception(e)
+        if not any(self._slots):
+            return
+        cache.seqlen_offset = max(self._lengths)
+        # attend over the longest slot's part of the cache, in buckets so the compiled step sees few shapes
+        cache.decode_window = min(bucket_length(cache.seqlen_offset + 1), cache.max_seqlen)
+
+        pos_idx = self._pos.view(bsz, 1, 1).expand(bsz, 9, 1)
+        input_ids = self._codes.gather(2, pos_idx - 1)
+        with model.decode_lock:  # shared with `generate` / `stream` on the same model
+            logits = self._decode_one_token(input_ids, cache, self.cfg_scale, allow_cudagraphs=False)
+        if self._logit_bias is None:
+            self._logit_bias = torch.zeros_like(logits)
+            self._logit_bias[:, 1:, eos_token_id] = -torch.inf  # only allow codebook 0 to predict EOS
+        logits += self._logit_bias
+
+        window = self.sampling_params.get("repetition_penalty_window", 2)
+        window_idx = (pos_idx - window + torch.arange(window, device=pos_idx.device)).clamp(min=0)
+        generated_tokens = self._codes.gather(2, window_idx)
+        # each slot samples from its own request's generator; one draw for the batch when none is seeded
+        generators = [request.generator if request is not None else None for request in self._slots]
+        if all(generator is None for generator in generators):
+            generators = None
+        next_token = self._sample(logits, generated_tokens=generated_tokens, generator=generators)
+
+        eos_in_cb0 = next_token[:, 0, 0] == eos_token_id
+        self._remaining = torch.where(eos_in_cb0, self._remaining.clamp(max=9), self._remaining)
+        self._stopping |= eos_in_cb0
+        eos_codebook_idx = (9 - self._remaining).clamp(max=9 - 1).unsqueeze(1)
+        codebooks = torch.arange(9, device=next_token.device)
+        stopping = self._stopping.unsqueeze(1)
+        tokens = next_token[..., 0]
+        tokens = torch.where(stopping & (codebooks < eos_codebook_idx), masked_token_id, tokens)
+        tokens = torch.where(stopping & (codebooks == eos_codebook_idx), eos_token_id, tokens)
+
+        frame = self._codes.gather(2, pos_idx)
+        self._codes.scatter_(2, pos_idx, torch.where(frame == -1, tokens.unsqueeze(-1), frame))
+
+        step = self._active.long()
+        cache.lengths_per_sample += step.repeat(self.num_rows).to(cache.lengths_per_sample.dtype)
+        self._pos += step
+        self._remaining -= step
+        for slot, request in enumerate(self._slots):
+            if request is not None:
+                self._lengths[slot] += 1
+
+        self._emit_frames()
+
+        for slot in (self._active & (self._remaining <= 0)).nonzero().flatten().tolist():
+            request = self._slots[slot]
+            offset = int(self._pos[slot]) - 1
+            delayed_codes = self._codes[slot : slot + 1, :, : request.max_new_tokens + 9]
+            out_codes = model._finalize_codes(delayed_codes, offset)
+            if not self._stopping[slot]:
+                self.num_truncated += 1
+                request.future.truncated = True
+                logger.warning("Request reached max_new_tokens=%d without EOS and was truncated", request.max_new_tokens)
+            self._release(slot)
+            request.future.set_result(out_codes)
+
+    def _emit_frames(self):
+        """Hand the newly settled frames of streaming requests to their consumers, `chunk_frames` at a time."""
+        due = []
+        for slot, request in enumerate(self._slots):
+            if request is None or request.frames is None:
+                continue
+            offset = self._lengths[slot] - request.prefix_conditioning.shape[1]  # last written delayed frame
+            settled = offset - 9  # frames that are complete in every codebook
+            if settled - request.emitted_frames >= request.chunk_frames:
+                due.append((slot, request, offset, settled))
+        if not due:
+            return
+        stopping = self._stopping.tolist()
+        for slot, request, offset, settled in due:
+            if stopping[slot]:
+                continue  # past EOS, the rest comes with the result
+            codes = revert_delay_pattern(self._codes[slot : slot + 1, :, request.emitted_frames : offset + 1])
+            request.frames.put(codes[..., : settled - request.emitted_frames].clone())
+            request.emitted_frames = settled
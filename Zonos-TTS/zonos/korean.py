@@ -0,0 +1,124 @@
+"""
+Korean text normalization: numbers and Latin acronyms are written out in Hangul before phonemization, the way
+they are read, so that eSpeak's Korean voice doesn't have to guess at them (or get English words to read).
+"""
+
+import re
+
+_SINO_DIGITS = "영일이삼사오육칠팔구"
+_SPOKEN_DIGITS = "공일이삼사오육칠팔구"  # digit by digit, as in phone numbers
+_SINO_UNITS = ["", "십", "백", "천"]
+_SINO_GROUPS = ["", "만", "억", "조", "경"]
+
+_NATIVE_ONES = ["", "하나", "둘", "셋", "넷", "다섯", "여섯", "일곱", "여덟", "아홉"]
+_NATIVE_TENS = ["", "열", "스물", "서른", "마흔", "쉰", "예순", "일흔", "여든", "아흔"]
+_NATIVE_PRENOMINAL = {"하나": "한", "둘": "두", "셋": "세", "넷": "네", "스물": "스무"}
+
+# Counters read with native numbers ("3개" is "세 개", "3분" is "삼분"), longest first
+_NATIVE_COUNTERS = ["번째", "시간", "군데", "사람", "가지", "마리", "개", "명", "살", "시", "잔", "권", "달", "곳"]
+# Counters that start like a native one but take Sino-Korean numbers ("3개월" is "삼 개월")
+_SINO_COUNTERS = ["개월", "달러"]
+# A counter is only a counter if its word ends there or goes on with a particle ("3개를", not "3개발자")
+_PARTICLES = ["으로", "이나", "부터", "까지", "정도", "이", "가", "을", "를", "은", "는", "의", "에", "도", "만", "과", "와",
+              "로", "씩", "쯤", "입", "요"]  # fmt: skip
+_counter_end = r"(?![가-힣])|(?=" + "|".join(_PARTICLES) + ")"
+
+_LETTER_NAMES = {
+    "A": "에이", "B": "비", "C": "씨", "D": "디", "E": "이", "F": "에프", "G": "지", "H": "에이치", "I": "아이",
+    "J": "제이", "K": "케이", "L": "엘", "M": "엠", "N": "엔", "O": "오", "P": "피", "Q": "큐", "R": "알",
+    "S": "에스", "T": "티", "U": "유", "V": "브이", "W": "더블유", "X": "엑스", "Y": "와이", "Z": "지",
+}  # fmt: skip
+_ENGLISH_DIGITS = ["제로", "원", "투", "쓰리", "포", "파이브", "식스", "세븐", "에잇", "나인"]
+
+_needs_normalization_re = re.compile(r"[0-9A-Z]")
+_phone_number_re = re.compile(r"(?<![0-9])0[0-9]{1,2}-[0-9]{3,4}-[0-9]{4}(?![0-9])")
+_irregular_month_re = re.compile(r"(?<![0-9])(6|10)\s*월")  # "유월", "시월"
+_grouped_number_re = re.compile(r"(?<![0-9])[0-9]{1,3}(?:,[0-9]{3})+(?![0-9])")
+# Whole upper-case words, digits included ("AWS", "EC2"), and their plurals ("APIs"); mixed-case words ("iOS",
+# "OAuth") are left to eSpeak
+_acronym_re = re.compile(r"(?<![A-Za-z0-9])([A-Z][A-Z0-9]*)(s?)(?![A-Za-z0-9])")
+_percent_re = re.compile(r"(?<=[0-9])\s*%")
+_decimal_re = re.compile(r"([0-9]+)\.([0-9]+)")
+_sino_counter_re = re.compile(r"(?<![0-9])([0-9]+)\s*(" + "|".join(_SINO_COUNTERS) + ")(?:" + _counter_end + ")")
+_native_counter_re = re.compile(
+    r"(?<![0-9])([0-9]{1,2})\s*(" + "|".join(_NATIVE_COUNTERS) + ")(?:" + _counter_end + ")"
+)
+_number_re = re.compile(r"[0-9]+")
+
+
+def read_sino_korean(num: int) -> str:
+    """Sino-Korean reading of `num` < 10^20: 1 is "일", 15 is "십오", 10000 is "만"."""
+    if num == 0:
+        return _SINO_DIGITS[0]
+    groups = []
+    for group_index, group_unit in enumerate(_SINO_GROUPS):
+        num, group = divmod(num, 10000)
+        if group == 1 and group_index == 1:
+            groups.append(group_unit)
+        elif group:
+            words = ""
+            for place in reversed(range(4)):
+                digit = group // 10**place % 10
+                if digit:
+                    words += ("" if digit == 1 and place > 0 else _SINO_DIGITS[digit]) + _SINO_UNITS[place]
+            groups.append(words + group_unit)
+        if not num:
+            break
+    return "".join(reversed(groups))
+
+
+def read_native_korean(num: int) -> str:
+    """Native Korean reading of 0 < `num` < 100 in front of a counter: 3 is "세", 21 is "스물한"."""
+    tens, ones = divmod(num, 10)
+    word = _NATIVE_ONES[ones] if ones else _NATIVE_TENS[tens]
+    return (_NATIVE_TENS[tens] if ones else "") + _NATIVE_PRENOMINAL.get(word, word)
+
+
+def _expand_acronym(m: re.Match) -> str:
+    letters, plural = m.groups()
+    return "".join(_LETTER_NAMES.get(c) or _ENGLISH_DIGITS[int(c)] for c in letters) + ("스" if plural else "")
+
+
+def _expand_phone_number(m: re.Match) -> str:
+    return "".join(_SPOKEN_DIGITS[int(c)] if c.isdigit() else c for c in m.group(0))
+
+
+def _expand_decimal(m: re.Match) -> str:
+    return read_sino_korean(int(m.group(1))) + "점" + "".join(_SINO_DIGITS[int(d)] for d in m.group(2))
+
+
+def _expand_sino_counter(m: re.Match) -> str:
+    return f"{read_sino_korean(int(m.group(1)))} {m.group(2)}"
+
+
+def _expand_native_counter(m: re.Match) -> str:
+    num, counter = int(m.group(1)), m.group(2)
+    if num == 0:
+        return m.group(0)
+    if num == 1 and counter == "번째":
+        return "첫 번째"
+    return f"{read_native_korean(num)} {counter}"
+
+
+def _expand_number(m: re.Match) -> str:
+    digits = m.group(0)
+    if (len(digits) > 1 and digits[0] == "0") or len(digits) > 20:
+        return "".join(_SPOKEN_DIGITS[int(d)] for d in digits)
+    return read_sino_korean(int(digits))
+
+
+def normalize_korean_text(text: str) -> str:
+    """Write out the numbers and acronyms of `text` in Hangul. Text with neither is returned as is."""
+    if not _needs_normalization_re.search(text):
+        return text
+    text = _phone_number_re.sub(_expand_phone_number, text)
+    text = _irregular_month_re.sub(lambda m: "유월" if m.group(1) == "6" else "시월", text)
+    text = _grouped_number_re.sub(lambda m: m.group(0).replace(",", ""), text)
+    # before the numbers, so that the digits of "EC2" are read as part of it
+    text = _acronym_re.sub(_expand_acronym, text)
+    text = _percent_re.sub(" 퍼센트", text)
+    text = _decimal_re.sub(_expand_decimal, text)
+    text = _sino_counter_re.sub(_expand_sino_counter, text)
+    text = _native_counter_re.sub(_expand_native_counter, text)
+    text = _number_re.sub(_expand_number, text)
+    return text
@@ -1,6 +1,9 @@
 import json
+import logging
+import threading
+import time
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 
 import safetensors
 import torch
@@ -8,34 +11,52 @@ import torch.nn as nn
 from huggingface_hub import hf_hub_download
 from tqdm import tqdm
 
-from zonos.autoencoder import DACAutoencoder
+from zonos.autoencoder import DACAutoencoder, DACStreamDecoder
 from zonos.backbone import BACKBONES
+from zonos.cache_pool import InferenceCachePool
 from zonos.codebook_pattern import apply_delay_pattern, revert_delay_pattern
-from zonos.conditioning import PrefixConditioner
+from zonos.codebooks import CodebookEmbedding, CodebookHeads
+from zonos.conditioning import ConditioningPreset, PrefixConditioner
+from zonos.conditioning_cache import ConditioningCache, conditioning_key
 from zonos.config import InferenceParams, ZonosConfig
-from zonos.sampling import sample_from_logits
+from zonos.paged_cache import BlockTable, PagedKVCache
+from zonos.quantization import quantize_int8_
+from zonos.sampling import make_sampler
 from zonos.speaker_cloning import SpeakerEmbeddingLDA
-from zonos.utils import DEFAULT_DEVICE, find_multiple, pad_weight_
+from zonos.utils import DEFAULT_DEVICE, bucket_length, find_multiple, init_empty_parameters, load_safetensors_mmap
 
 DEFAULT_BACKBONE_CLS = next(iter(BACKBONES.values()))
 
+logger = logging.getLogger(__name__)
+
 
 class Zonos(nn.Module):
-    def __init__(self, config: ZonosConfig, backbone_cls=DEFAULT_BACKBONE_CLS):
+    def __init__(
+        self, config: ZonosConfig, backbone_cls=DEFAULT_BACKBONE_CLS, autoencoder: DACAutoencoder | None = None
+    ):
         super().__init__()
         self.config = config
         dim = config.backbone.d_model
         self.eos_token_id = config.eos_token_id
         self.masked_token_id = config.masked_token_id
 
-        self.autoencoder = DACAutoencoder()
+        self.load_timings = {}  # seconds spent loading each component
+        if autoencoder is None:
+            t0 = time.perf_counter()
+            autoencoder = DACAutoencoder()
+            self.load_timings["dac"] = time.perf_counter() - t0
+        self.autoencoder = autoencoder
         self.backbone = backbone_cls(config.backbone)
         self.prefix_conditioner = PrefixConditioner(config.prefix_conditioner, dim)
         self.spk_clone_model = None
+        self.conditioning_cache: ConditioningCache | None = None
+        self.cache_pool: InferenceCachePool | None = None
+        self.kv_pages: PagedKVCache | None = None  # KV pages for the caches of `generate`, if paged
 
-        # TODO: pad to multiple of at least 8
-        self.embeddings = nn.ModuleList([nn.Embedding(1026, dim) for _ in range(self.autoencoder.num_codebooks)])
-        self.heads = nn.ModuleList([nn.Linear(dim, 1025, bias=False) for _ in range(self.autoencoder.num_codebooks)])
+        # All codebooks in one embedding table and one head projection (loaded from per-codebook checkpoint weights)
+        num_codebooks = self.autoencoder.num_codebooks
+        self.embeddings = CodebookEmbedding(num_codebooks, 1026, dim)
+        self.heads = CodebookHeads(num_codebooks, dim, find_multiple(1025, config.pad_vocab_to_multiple_of))
 
         self._cg_graph = None
         self._cg_batch_size = None
@@ -43,13 +64,10 @@ class Zonos(nn.Module):
         self._cg_logits = None
         self._cg_inference_params = None
         self._cg_scale = None
-
-        if config.pad_vocab_to_multiple_of:
-            self.register_load_state_dict_post_hook(self._pad_embeddings_and_heads)
-
-    def _pad_embeddings_and_heads(self, *args, **kwargs):
-        for w in [*self.embeddings, *self.heads]:
-            pad_weight_(w, self.config.pad_vocab_to_multiple_of)
+        self._compiled_decode_one_token = None
+        # Held around each decode step: the compiled step and the CUDA graph are shared by `generate` /
+        # `stream` callers and the batching engine's thread, and neither is safe to run concurrently.
+        self.decode_lock = threading.Lock()
 
     @property
     def device(self) -> torch.device:
@@ -80,8 +98,26 @@ class Zonos(nn.Module):
 
     @classmethod
     def from_local(
-        cls, config_path: str, model_path: str, device: str = DEFAULT_DEVICE, backbone: str | None = None
+        cls,
+        config_path: str,
+        model_path: str,
+        device: str = DEFAULT_DEVICE,
+        backbone: str | None = None,
+        mmap: bool = True,
+        quantize: str | None = None,
     ) -> "Zonos":
+        """
+        With `mmap`, the parameters are not initialized: they are assigned the checkpoint tensors directly.
+        On CPU those are views into a memory map of the file, so loading reads nothing up front and
+        processes serving the same checkpoint share its pages. On GPU each tensor is read straight to the
+        device. `mmap=False` initializes the model and copies the checkpoint into it instead.
+
+        `quantize="int8"` stores the linear layers of the backbone and the heads as int8 weights with
+        per-channel scales (`WeightOnlyInt8Linear`), about half the memory of bfloat16. Meant for CPU serving,
+        with the compiled decode step. Requires the torch backbone.
+        """
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization: {quantize}")
         config = ZonosConfig.from_dict(json.load(open(config_path)))
         if backbone:
             backbone_cls = BACKBONES[backbone]
@@ -91,17 +127,59 @@ class Zonos(nn.Module):
             # Preferentially route to pure torch backbone for increased performance and lower latency.
             if is_transformer and "torch" in BACKBONES:
                 backbone_cls = BACKBONES["torch"]
-
-        model = cls(config, backbone_cls).to(device, torch.bfloat16)
-        model.autoencoder.dac.to(device)
-
-        sd = model.state_dict()
-        with safetensors.safe_open(model_path, framework="pt") as f:
-            for k in f.keys():
-                sd[k] = f.get_tensor(k)
-        model.load_state_dict(sd)
-
-        return model
+        if quantize and backbone_cls is not BACKBONES["torch"]:
+            # mamba_ssm reads its projection weights directly in fused kernels
+            raise ValueError(f"{quantize} quantization requires the torch backbone")
+
+        t0 = time.perf_counter()
+        autoencoder = DACAutoencoder()
+        autoencoder.dac.to(device)
+        dac_time = time.perf_counter() - t0
+
+        if not mmap:
+            t0 = time.perf_counter()
+            model = cls(config, backbone_cls, autoencoder).to(device, torch.bfloat16)
+            model.load_timings.update(dac=dac_time, backbone=time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            sd = model.state_dict()
+            with safetensors.safe_open(model_path, framework="pt") as f:
+                for k in f.keys():
+                    sd[k] = f.get_tensor(k)
+            model.load_state_dict(sd)
+            model.load_timings["weights"] = time.perf_counter() - t0
+            return model._quantize(quantize)
+
+        t0 = time.perf_counter()
+        with init_empty_parameters():
+            model = cls(config, backbone_cls, autoencoder)
+        model.load_timings.update(dac=dac_time, backbone=time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        if torch.device(device).type == "cpu":
+            sd = load_safetensors_mmap(model_path)
+        else:
+            with safetensors.safe_open(model_path, framework="pt", device=str(device)) as f:
+                sd = {k: f.get_tensor(k) for k in f.keys()}
+        unexpected = model.load_state_dict(sd, strict=False, assign=True).unexpected_keys
+        if unexpected:
+            raise ValueError(f"Unexpected keys in checkpoint: {unexpected}")
+        missing = [name for name, p in model.named_parameters() if p.is_meta]
+        if missing:
+            raise ValueError(f"Checkpoint has no weights for {missing}, load it with mmap=False")
+        # no-op for tensors already in bfloat16 on `device`, so those stay backed by the file
+        model.to(device, torch.bfloat16)
+        model.load_timings["weights"] = time.perf_counter() - t0
+
+        return model._quantize(quantize)
+
+    def _quantize(self, quantize: str | None) -> "Zonos":
+        if quantize == "int8":
+            t0 = time.perf_counter()
+            quantize_int8_(self.backbone)
+            quantize_int8_(self.heads)
+            self.load_timings["quantize"] = time.perf_counter() - t0
+        return self
 
     def make_speaker_embedding(self, wav: torch.Tensor, sr: int) -> torch.Tensor:
         """Generate a speaker embedding from an audio clip."""
@@ -111,20 +189,30 @@ class Zonos(nn.Module):
         return spk_embedding.unsqueeze(0).bfloat16()
 
     def embed_codes(self, codes: torch.Tensor) -> torch.Tensor:
-        return sum(emb(codes[:, i]) for i, emb in enumerate(self.embeddings))
+        return self.embeddings(codes)
 
     def apply_heads(self, hidden_states: torch.Tensor) -> torch.Tensor:
-        return torch.stack([head(hidden_states) for head in self.heads], dim=1)
+        return self.heads(hidden_states)
 
     def _compute_logits(
-        self, hidden_states: torch.Tensor, inference_params: InferenceParams, cfg_scale: float
+        self,
+        hidden_states: torch.Tensor,
+        inference_params: InferenceParams,
+        cfg_scale: float,
+        num_positions: int | None = None,
     ) -> torch.Tensor:
         """
         Pass `hidden_states` into `backbone` and `multi_head`, applying
         classifier-free guidance if `cfg_scale != 1.0`.
+
+        Returns the logits `[bsz, 9, vocab]` of the last position, or with `num_positions`, those
+        `[bsz, 9, num_positions, vocab]` of the last `num_positions` positions (e.g. to verify several
+        speculative frames in one forward).
         """
-        last_hidden_states = self.backbone(hidden_states, inference_params)[:, -1, :].unsqueeze(1)
-        logits = self.apply_heads(last_hidden_states).squeeze(2).float()
+        last_hidden_states = self.backbone(hidden_states, inference_params)[:, -(num_positions or 1) :, :]
+        logits = self.apply_heads(last_hidden_states).float()
+        if num_positions is None:
+            logits = logits.squeeze(2)
         if cfg_scale != 1.0:
             cond_logits, uncond_logits = logits.chunk(2)
             logits = uncond_logits + (cond_logits - uncond_logits) * cfg_scale
@@ -139,26 +227,30 @@ class Zonos(nn.Module):
         allow_cudagraphs: bool = True,
     ) -> torch.Tensor:
         """
-        Single-step decode. Prepares the hidden states, possibly replicates them
-        for CFG, and then delegates to `_compute_logits`.
+        Single-step decode. Prepares the hidden states, replicates them for CFG
+        unless `cfg_scale == 1.0`, and then delegates to `_compute_logits`.
 
         Below we wrap this function with a simple CUDA Graph capturing mechanism,
         doing 3 warmup steps if needed and then capturing or replaying the graph.
-        We only recapture if the batch size changes.
+        We only recapture if the batch size or the use of CFG changes.
         """
-        # TODO: support cfg_scale==1
-        if cfg_scale == 1.0:
-            hidden_states = self.embed_codes(input_ids)
-            return self._compute_logits(hidden_states, inference_params, cfg_scale)
-
         bsz = input_ids.size(0)
+        cfg = bool(cfg_scale != 1.0)
 
-        if not allow_cudagraphs or input_ids.device.type != "cuda":
-            hidden_states_local = self.embed_codes(input_ids)
-            hidden_states_local = hidden_states_local.repeat(2, 1, 1)
-            return self._compute_logits(hidden_states_local, inference_params, cfg_scale)
+        def embed(input_ids: torch.Tensor) -> torch.Tensor:
+            hidden_states = self.embed_codes(input_ids)
+            return hidden_states.repeat(2, 1, 1) if cfg else hidden_states
 
-        need_capture = (self._cg_graph is None) or (self._cg_batch_size != bsz)
+        if not allow_cudagraphs or input_ids.device.type != "cuda":
+            return self._compute_logits(embed(input_ids), inference_params, cfg_scale)
+
+        # The graph is bound to the cache it was captured with, so another cache needs a graph of its own
+        need_capture = (
+            (self._cg_graph is None)
+            or (self._cg_inference_params is not inference_params)
+            or (self._cg_batch_size != bsz)
+            or (bool(self._cg_scale != 1.0) != cfg)
+        )
 
         if need_capture:
             self._cg_graph = None
@@ -168,9 +260,7 @@ class Zonos(nn.Module):
             self._cg_scale = cfg_scale
 
             for _ in range(3):
-                hidden_states = self.embed_codes(input_ids)
-                hidden_states = hidden_states.repeat(2, 1, 1)  # because cfg != 1.0
-                logits = self._compute_logits(hidden_states, inference_params, cfg_scale)
+                logits = self._compute_logits(embed(input_ids), inference_params, cfg_scale)
 
             self._cg_input_ids = input_ids.clone()
             self._cg_logits = torch.empty_like(logits)
@@ -178,8 +268,7 @@ class Zonos(nn.Module):
             g = torch.cuda.CUDAGraph()
 
             def capture_region():
-                hidden_states_local = self.embed_codes(self._cg_input_ids)
-                hidden_states_local = hidden_states_local.repeat(2, 1, 1)
+                hidden_states_local = embed(self._cg_input_ids)
                 self._cg_logits = self._compute_logits(hidden_states_local, self._cg_inference_params, self._cg_scale)
 
             with torch.cuda.graph(g):
@@ -211,25 +300,97 @@ class Zonos(nn.Module):
         hidden_states = torch.cat([prefix_hidden_states, self.embed_codes(input_ids)], dim=1)
         return self._compute_logits(hidden_states, inference_params, cfg_scale)
 
-    def setup_cache(self, batch_size: int, max_seqlen: int, dtype: torch.dtype = torch.bfloat16) -> InferenceParams:
+    @staticmethod
+    def cache_length(max_seqlen: int, kv_pages: PagedKVCache | None = None) -> int:
+        """The length `setup_cache` allocates for `max_seqlen`."""
         max_seqlen = find_multiple(max_seqlen, 8)
-        key_value_memory_dict = self.backbone.allocate_inference_cache(batch_size, max_seqlen, dtype=dtype)
+        return find_multiple(max_seqlen, kv_pages.block_size) if kv_pages is not None else max_seqlen
+
+    def setup_cache(
+        self,
+        batch_size: int,
+        max_seqlen: int,
+        dtype: torch.dtype = torch.bfloat16,
+        kv_pages: PagedKVCache | None = None,
+    ) -> InferenceParams:
+        """
+        With `kv_pages`, the cache takes its KV entries from those shared pages as it grows, instead of
+        allocating `max_seqlen` entries per row; `InferenceParams.reserve` must then run before each forward.
+        """
+        max_seqlen = self.cache_length(max_seqlen, kv_pages)
+        block_table = None
+        if kv_pages is not None:
+            key_value_memory_dict = kv_pages.pages
+            block_table = BlockTable(kv_pages, batch_size, max_seqlen)
+        else:
+            key_value_memory_dict = self.backbone.allocate_inference_cache(batch_size, max_seqlen, dtype=dtype)
         lengths_per_sample = torch.full((batch_size,), 0, dtype=torch.int32)
-        return InferenceParams(max_seqlen, batch_size, 0, 0, key_value_memory_dict, lengths_per_sample)
+        return InferenceParams(
+            max_seqlen, batch_size, 0, 0, key_value_memory_dict, lengths_per_sample, block_table=block_table
+        )
+
+    def make_preset(self, cond_dict: dict) -> ConditioningPreset:
+        """
+        Computes the prefix conditioning of everything in `cond_dict` but its text once, for
+        `prepare_conditioning(preset.make_cond_dict(text), preset=preset)` to only condition the text.
+        """
+        uncond_dict = {k: cond_dict[k] for k in self.prefix_conditioner.required_keys}
+        return ConditioningPreset(
+            cond_dict,
+            self.prefix_conditioner.precompute(cond_dict),
+            self.prefix_conditioner.precompute(uncond_dict),
+            conditioning_key({k: v for k, v in cond_dict.items() if k != "espeak"}),
+        )
+
+    def prepare_conditioning(
+        self, cond_dict: dict, uncond_dict: dict | None = None, preset: ConditioningPreset | None = None
+    ) -> torch.Tensor:
+        """With `preset`, `cond_dict` is one of `preset.make_cond_dict` and only its text is conditioned."""
+        if preset is not None and uncond_dict is not None:
+            raise ValueError("A preset already has its uncond conditioning")
+
+        key = None
+        if self.conditioning_cache is not None:
+            if preset is not None:
+                # the preset's key stands for the rest, whose tensors would have to be copied back to hash
+                key = conditioning_key({"espeak": cond_dict["espeak"], "preset": preset.key})
+            else:
+                key = conditioning_key(cond_dict, uncond_dict)
+            conditioning = self.conditioning_cache.get(key, self.device)
+            if conditioning is not None:
+                return conditioning
 
-    def prepare_conditioning(self, cond_dict: dict, uncond_dict: dict | None = None) -> torch.Tensor:
         if uncond_dict is None:
             uncond_dict = {k: cond_dict[k] for k in self.prefix_conditioner.required_keys}
-        return torch.cat(
+        conditioning = torch.cat(
             [
-                self.prefix_conditioner(cond_dict),
-                self.prefix_conditioner(uncond_dict),
+                self.prefix_conditioner(cond_dict, preset.cond if preset is not None else None),
+                self.prefix_conditioner(uncond_dict, preset.uncond if preset is not None else None),
             ]
-        )
+        ).detach()
+
+        if key is not None:
+            self.conditioning_cache.put(key, conditioning)
+        return conditioning
 
     def can_use_cudagraphs(self) -> bool:
-        # Only the mamba-ssm backbone supports CUDA Graphs at the moment
-        return self.device.type == "cuda" and "_mamba_ssm" in str(self.backbone.__class__)
+        # The mamba-ssm backbone, and backbones whose decode step has static shapes
+        static_decode = getattr(self.backbone, "static_decode", False)
+        return self.device.type == "cuda" and ("_mamba_ssm" in str(self.backbone.__class__) or static_decode)
+
+    def compiled_decode_one_token(self) -> Callable[..., torch.Tensor]:
+        """
+        `_decode_one_token` under `torch.compile`, wrapped once per model. Backbones with a static-shape
+        decode step are compiled for fixed shapes instead of dynamic ones: one graph per batch size, cache
+        length and `decode_window`, which callers keep to a few `bucket_length`s.
+        """
+        if self._compiled_decode_one_token is None:
+            static_decode = getattr(self.backbone, "static_decode", False)
+            if static_decode:
+                # room for every (batch size, length bucket) graph, which would fall back to eager past the limit
+                torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 64)
+            self._compiled_decode_one_token = torch.compile(self._decode_one_token, dynamic=not static_decode)
+        return self._compiled_decode_one_token
 
     @torch.inference_mode()
     def generate(
@@ -240,26 +401,143 @@ class Zonos(nn.Module):
         # max_new_tokens = max(86 * 55, prefix_conditioning.shape[1] * 2),
         cfg_scale: float = 2.0,
         batch_size: int = 1,
-        sampling_params: dict = dict(min_p=0.1),
+        sampling_params: dict | None = None,  # of `sample_from_logits`, min_p=0.1 by default
         progress_bar: bool = True,
         disable_torch_compile: bool = False,
         callback: Callable[[torch.Tensor, int, int], bool] | None = None,
+        generator: torch.Generator | None = None,  # on the model's device, for reproducible sampling
+        return_truncated: bool = False,
     ):
-        assert cfg_scale != 1, "TODO: add support for cfg_scale=1"
+        """
+        Generates codes `[bsz, 9, seq_len]`. A sequence that has not emitted EOS within `max_new_tokens`
+        is cut there; with `return_truncated`, also returns which ones were, as a bool tensor `[bsz]`.
+        Sequences stopped by `callback` are not counted as truncated.
+        """
+        frames = self._generate_frames(
+            prefix_conditioning,
+            audio_prefix_codes,
+            max_new_tokens,
+            cfg_scale,
+            batch_size,
+            sampling_params,
+            progress_bar,
+            disable_torch_compile,
+            generator=generator,
+        )
+        stopped = False
+        for step, (delayed_codes, offset, max_steps) in enumerate(frames):
+            frame = delayed_codes[..., offset : offset + 1]
+            if step > 0 and callback is not None and not callback(frame, step, max_steps):
+                stopped = True
+                break
+        frames.close()
+
+        if stopped:
+            truncated = torch.zeros(delayed_codes.shape[0], dtype=torch.bool, device=delayed_codes.device)
+        else:
+            truncated = self._truncated(delayed_codes, offset, max_new_tokens)
+        out_codes = self._finalize_codes(delayed_codes, offset)
+        return (out_codes, truncated) if return_truncated else out_codes
+
+    @torch.inference_mode()
+    def stream(
+        self,
+        prefix_conditioning: torch.Tensor,  # [bsz, cond_seq_len, d_model]
+        audio_prefix_codes: torch.Tensor | None = None,  # [bsz, 9, prefix_audio_seq_len]
+        max_new_tokens: int = 86 * 60,
+        cfg_scale: float = 2.0,
+        batch_size: int = 1,
+        sampling_params: dict | None = None,  # of `sample_from_logits`, min_p=0.1 by default
+        progress_bar: bool = False,
+        disable_torch_compile: bool = False,
+        chunk_frames: int = 24,
+        context_frames: int = 12,
+        lookahead_frames: int = 6,
+        crossfade_frames: int = 2,
+        generator: torch.Generator | None = None,
+    ) -> Iterator[torch.Tensor]:
+        """
+        Like `generate`, but yields waveform chunks `[bsz, 1, num_samples]` while decoding.
+
+        An audio frame is settled once all 9 codebooks have been generated past the delay pattern.
+        Every `chunk_frames` settled frames are decoded with `DACStreamDecoder`, which decodes
+        overlapping windows of codes and crossfades the seams. Concatenating the chunks gives the
+        whole utterance.
+        """
+        decoder = DACStreamDecoder(self.autoencoder, context_frames, lookahead_frames, crossfade_frames)
+        frames = self._generate_frames(
+            prefix_conditioning,
+            audio_prefix_codes,
+            max_new_tokens,
+            cfg_scale,
+            batch_size,
+            sampling_params,
+            progress_bar,
+            disable_torch_compile,
+            generator=generator,
+        )
+        for delayed_codes, offset, _ in frames:
+            settled = offset - 9  # frames that are complete in every codebook, and before any EOS
+            if settled - lookahead_frames - decoder.emitted_frames < chunk_frames:
+                continue
+            pushed = decoder.num_frames
+            codes = revert_delay_pattern(delayed_codes[..., pushed : offset + 1])[..., : settled - pushed]
+            codes.masked_fill_(codes >= 1024, 0)
+            wav = decoder.push(codes)
+            if wav.shape[-1] > 0:
+                yield wav
+
+        self._truncated(delayed_codes, offset, max_new_tokens)
+        out_codes = self._finalize_codes(delayed_codes, offset)
+        yield decoder.push(out_codes[..., decoder.num_frames :], final=True)
+
+    def _generate_frames(
+        self,
+        prefix_conditioning: torch.Tensor,
+        audio_prefix_codes: torch.Tensor | None,
+        max_new_tokens: int,
+        cfg_scale: float,
+        batch_size: int,
+        sampling_params: dict | None,
+        progress_bar: bool,
+        disable_torch_compile: bool,
+        generator: torch.Generator | None = None,
+    ) -> Iterator[tuple[torch.Tensor, int, int]]:
+        """
+        The autoregressive loop behind `generate` and `stream`. Yields `(delayed_codes, offset, max_steps)`
+        after the prefill and after every decode step, where `offset` is the last written frame.
+
+        With `cfg_scale == 1.0` there is no classifier-free guidance: the cache holds one row per sample
+        instead of two, and only the cond rows of `prefix_conditioning` are used.
+        """
+        num_rows = 1 if cfg_scale == 1.0 else 2
+        if num_rows == 1 and prefix_conditioning.shape[0] == 2 * batch_size:
+            prefix_conditioning = prefix_conditioning[:batch_size]  # drop the uncond rows
         prefix_audio_len = 0 if audio_prefix_codes is None else audio_prefix_codes.shape[2]
         device = self.device
 
         # Use CUDA Graphs if supported, and torch.compile otherwise.
         cg = self.can_use_cudagraphs()
         decode_one_token = self._decode_one_token
-        decode_one_token = torch.compile(decode_one_token, dynamic=True, disable=cg or disable_torch_compile)
+        if not (cg or disable_torch_compile):
+            decode_one_token = self.compiled_decode_one_token()
 
         unknown_token = -1
         audio_seq_len = prefix_audio_len + max_new_tokens
         seq_len = prefix_conditioning.shape[1] + audio_seq_len + 9
+        static_decode = getattr(self.backbone, "static_decode", False)
+        if static_decode:
+            # a few cache lengths for all texts, instead of one compiled decode step / CUDA graph per text length
+            seq_len = bucket_length(seq_len)
 
+        if self.cache_pool is not None:
+            inference_params = self.cache_pool.acquire(batch_size * num_rows, seq_len)
+        else:
+            with torch.device(device):
+                inference_params = self.setup_cache(
+                    batch_size=batch_size * num_rows, max_seqlen=seq_len, kv_pages=self.kv_pages
+                )
         with torch.device(device):
-            inference_params = self.setup_cache(batch_size=batch_size * 2, max_seqlen=seq_len)
             codes = torch.full((batch_size, 9, audio_seq_len), unknown_token)
 
         if audio_prefix_codes is not None:
@@ -269,16 +547,17 @@ class Zonos(nn.Module):
 
         delayed_prefix_audio_codes = delayed_codes[..., : prefix_audio_len + 1]
 
+        prefix_length = prefix_conditioning.shape[1] + prefix_audio_len + 1
+        inference_params.reserve(prefix_length)
         logits = self._prefill(prefix_conditioning, delayed_prefix_audio_codes, inference_params, cfg_scale)
-        next_token = sample_from_logits(logits, **sampling_params)
+        inference_params.seqlen_offset += prefix_length
+        inference_params.lengths_per_sample[:] += prefix_length
+        sample = make_sampler(dict(min_p=0.1) if sampling_params is None else sampling_params)
+        next_token = sample(logits, generator=generator)
 
         offset = delayed_prefix_audio_codes.shape[2]
         frame = delayed_codes[..., offset : offset + 1]
-        frame.masked_scatter_(frame == unknown_token, next_token)
-
-        prefix_length = prefix_conditioning.shape[1] + prefix_audio_len + 1
-        inference_params.seqlen_offset += prefix_length
-        inference_params.lengths_per_sample[:] += prefix_length
+        frame.copy_(torch.where(frame == unknown_token, next_token, frame))
 
         logit_bias = torch.zeros_like(logits)
         logit_bias[:, 1:, self.eos_token_id] = -torch.inf  # only allow codebook 0 to predict EOS
@@ -286,43 +565,84 @@ class Zonos(nn.Module):
         stopping = torch.zeros(batch_size, dtype=torch.bool, device=device)
         max_steps = delayed_codes.shape[2] - offset
         remaining_steps = torch.full((batch_size,), max_steps, device=device)
+        codebooks = torch.arange(9, device=device).view(1, 9, 1)
         progress = tqdm(total=max_steps, desc="Generating", disable=not progress_bar)
         cfg_scale = torch.tensor(cfg_scale)
 
-        step = 0
-        while torch.max(remaining_steps) > 0:
-            offset += 1
-            input_ids = delayed_codes[..., offset - 1 : offset]
-            logits = decode_one_token(input_ids, inference_params, cfg_scale, allow_cudagraphs=cg)
-            logits += logit_bias
-
-            next_token = sample_from_logits(logits, generated_tokens=delayed_codes[..., :offset], **sampling_params)
-            eos_in_cb0 = next_token[:, 0] == self.eos_token_id
-
-            remaining_steps[eos_in_cb0[:, 0]] = torch.minimum(remaining_steps[eos_in_cb0[:, 0]], torch.tensor(9))
-            stopping |= eos_in_cb0[:, 0]
-
-            eos_codebook_idx = 9 - remaining_steps
-            eos_codebook_idx = torch.clamp(eos_codebook_idx, max=9 - 1)
-            for i in range(next_token.shape[0]):
-                if stopping[i]:
-                    idx = eos_codebook_idx[i].item()
-                    next_token[i, :idx] = self.masked_token_id
-                    next_token[i, idx] = self.eos_token_id
-
-            frame = delayed_codes[..., offset : offset + 1]
-            frame.masked_scatter_(frame == unknown_token, next_token)
-            inference_params.seqlen_offset += 1
-            inference_params.lengths_per_sample[:] += 1
-
-            remaining_steps -= 1
-
-            progress.update()
-            step += 1
-
-            if callback is not None and not callback(frame, step, max_steps):
-                break
-
+        try:
+            yield delayed_codes, offset, max_steps
+
+            # The loop ends once every sequence has run out of steps. A sequence that emits EOS still has
+            # its 9-step delay tail to go, so after reading `remaining_steps` (a host sync) the loop can run
+            # at least min(max remaining, 9) more steps before it needs to look again.
+            unchecked_steps = 0
+            while True:
+                if unchecked_steps == 0:
+                    unchecked_steps = min(int(remaining_steps.max()), 9)
+                    if unchecked_steps <= 0:
+                        break
+                unchecked_steps -= 1
+
+                offset += 1
+                input_ids = delayed_codes[..., offset - 1 : offset]
+                inference_params.reserve(inference_params.seqlen_offset + 1)
+                if static_decode and not cg:
+                    # attend over the cached part (in buckets), not the whole cache; a CUDA graph keeps its shapes
+                    inference_params.decode_window = min(
+                        bucket_length(inference_params.seqlen_offset + 1), inference_params.max_seqlen
+                    )
+                with self.decode_lock:
+                    logits = decode_one_token(input_ids, inference_params, cfg_scale, allow_cudagraphs=cg)
+                logits += logit_bias
+
+                next_token = sample(logits, generated_tokens=delayed_codes[..., :offset], generator=generator)
+                eos_in_cb0 = next_token[:, 0, 0] == self.eos_token_id
+
+                remaining_steps = torch.where(eos_in_cb0, remaining_steps.clamp(max=9), remaining_steps)
+                stopping |= eos_in_cb0
+
+                # Once stopping, codebooks before the one at its EOS step are masked, and that one gets EOS
+                eos_codebook_idx = (9 - remaining_steps).clamp(max=9 - 1).view(-1, 1, 1)
+                is_stopping = stopping.view(-1, 1, 1)
+                next_token = torch.where(is_stopping & (codebooks < eos_codebook_idx), self.masked_token_id, next_token)
+                next_token = torch.where(is_stopping & (codebooks == eos_codebook_idx), self.eos_token_id, next_token)
+
+                frame = delayed_codes[..., offset : offset + 1]
+                frame.copy_(torch.where(frame == unknown_token, next_token, frame))
+                inference_params.seqlen_offset += 1
+                inference_params.lengths_per_sample[:] += 1
+
+                remaining_steps -= 1
+
+                progress.update()
+
+                yield delayed_codes, offset, max_steps
+        finally:
+            progress.close()
+            with self.decode_lock:
+                # reset the cuda graph to avoid cache changes, unless it's another generation's by now
+                if self._cg_inference_params is inference_params:
+                    self._cg_graph = None
+                    self._cg_inference_params = None
+            inference_params.free_blocks()
+            if self.cache_pool is not None:
+                self.cache_pool.release(inference_params)
+
+    def _truncated(self, delayed_codes: torch.Tensor, offset: int, max_new_tokens: int) -> torch.Tensor:
+        """Which sequences never emitted EOS up to frame `offset`, i.e. ran into their length budget. Logged."""
+        truncated = (delayed_codes[:, 0, : offset + 1] != self.eos_token_id).all(dim=-1)
+        num_truncated = int(truncated.sum())
+        if num_truncated:
+            logger.warning(
+                "%d of %d sequences reached max_new_tokens=%d without EOS and were truncated",
+                num_truncated,
+                len(truncated),
+                max_new_tokens,
+            )
+        return truncated
+
+    def _finalize_codes(self, delayed_codes: torch.Tensor, offset: int) -> torch.Tensor:
+        """Undo the delay pattern of `delayed_codes` whose last written frame is `offset`, and append silence."""
         out_codes = revert_delay_pattern(delayed_codes)
         out_codes.masked_fill_(out_codes >= 1024, 0)
         out_codes = out_codes[..., : offset - 9]
@@ -331,7 +651,4 @@ class Zonos(nn.Module):
         silence_codes = torch.zeros((out_codes.shape[0], out_codes.shape[1], silence_duration), dtype=out_codes.dtype, device=out_codes.device)
         # 마지막에 무음 코드 concat
         out_codes = torch.cat([out_codes, silence_codes], dim=2)
-
-        self._cg_graph = None  # reset cuda graph to avoid cache changes
-
         return out_codes
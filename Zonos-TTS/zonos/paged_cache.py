@@ -0,0 +1,81 @@
+import threading
+
+import torch
+
+
+class PagedKVCache:
+    """
+    A pool of fixed-size KV cache pages, shared by any number of inference caches (see `Zonos.setup_cache`).
+
+    Instead of reserving `max_seqlen` entries per sequence, a cache only holds the pages its sequences have
+    reached, so many more concurrent sequences fit in the same memory. Page 0 is never handed out: it's the
+    scratch page that unassigned entries of a block table point to. Rows without pages of their own (idle
+    engine slots) still write their decode step's K/V there, so it holds garbage, but only at positions
+    past those rows' lengths, which attention masks out.
+    """
+
+    def __init__(
+        self,
+        backbone,
+        num_blocks: int,
+        block_size: int = 64,
+        dtype: torch.dtype = torch.bfloat16,
+        device: torch.device | str | None = None,
+    ):
+        if not hasattr(backbone, "allocate_paged_cache"):
+            raise ValueError(f"{type(backbone).__name__} doesn't support a paged KV cache")
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        with torch.device(device or next(backbone.parameters()).device):
+            self.pages = backbone.allocate_paged_cache(num_blocks, block_size, dtype=dtype)
+        self._free = list(range(num_blocks - 1, 0, -1))
+        self._lock = threading.Lock()
+
+    @property
+    def num_free_blocks(self) -> int:
+        return len(self._free)
+
+    def allocate(self, n: int) -> list[int]:
+        with self._lock:
+            if n > len(self._free):
+                raise RuntimeError(f"Out of KV cache pages: {n} requested, {len(self._free)} free")
+            return [self._free.pop() for _ in range(n)]
+
+    def free(self, blocks: list[int]):
+        with self._lock:
+            self._free.extend(blocks)
+
+
+class BlockTable:
+    """
+    Maps the positions of each row of one inference cache to pages of a `PagedKVCache`.
+
+    Pages are assigned on the host as rows grow (`reserve`), and mirrored into `tensor` `[batch_size, max_blocks]`,
+    which is updated in place so that compiled or graph-captured decode steps see new pages.
+    """
+
+    def __init__(self, kv_pages: PagedKVCache, batch_size: int, max_seqlen: int):
+        self.kv_pages = kv_pages
+        self.block_size = kv_pages.block_size
+        self.max_blocks = -(-max_seqlen // self.block_size)
+        self.blocks: list[list[int]] = [[] for _ in range(batch_size)]
+        self.tensor = torch.zeros(batch_size, self.max_blocks, dtype=torch.long)
+
+    def reserve(self, rows, num_tokens: int):
+        """Make sure `rows` have pages for their first `num_tokens` positions."""
+        num_blocks = -(-num_tokens // self.block_size)
+        if num_blocks > self.max_blocks:
+            raise ValueError(f"{num_tokens} tokens don't fit in a cache of {self.max_blocks * self.block_size}")
+        for row in rows:
+            blocks = self.blocks[row]
+            if len(blocks) < num_blocks:
+                new_blocks = self.kv_pages.allocate(num_blocks - len(blocks))
+                self.tensor[row, len(blocks) : num_blocks] = torch.tensor(new_blocks)
+                blocks.extend(new_blocks)
+
+    def release(self, rows):
+        rows = list(rows)
+        for row in rows:
+            self.kv_pages.free(self.blocks[row])
+            self.blocks[row] = []
+        self.tensor[rows] = 0
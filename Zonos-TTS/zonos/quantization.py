@@ -0,0 +1,50 @@
+# Based on gpt-fast: https://github.com/pytorch-labs/gpt-fast/blob/095b2229ee3a40e379c11f05b94bd6923db63b4b/quantize.py
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class WeightOnlyInt8Linear(nn.Module):
+    """
+    `nn.Linear` with int8 weights and one scale per output channel, computing in the input's dtype.
+    Under `torch.compile` the dequantization is fused into the matmul, so decode reads half the bytes.
+    """
+
+    def __init__(self, in_features: int, out_features: int, bias: bool = False, dtype: torch.dtype = torch.bfloat16):
+        super().__init__()
+        self.in_features = in_features
+        self.out_features = out_features
+        self.register_buffer("weight", torch.empty(out_features, in_features, dtype=torch.int8))
+        self.register_buffer("scales", torch.ones(out_features, dtype=dtype))
+        self.bias = nn.Parameter(torch.zeros(out_features, dtype=dtype)) if bias else None
+
+    @classmethod
+    @torch.no_grad()
+    def from_linear(cls, linear: nn.Linear) -> "WeightOnlyInt8Linear":
+        """Symmetric per-channel quantization of `linear`'s weight."""
+        weight = linear.weight.float()
+        scales = weight.abs().amax(dim=1).clamp(min=1e-8) / 127
+        module = cls(linear.in_features, linear.out_features, linear.bias is not None, linear.weight.dtype)
+        module.to(linear.weight.device)
+        module.weight.copy_(torch.round(weight / scales.unsqueeze(1)).clamp(-128, 127))
+        module.scales.copy_(scales)
+        if linear.bias is not None:
+            module.bias.copy_(linear.bias)
+        return module
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        y = F.linear(x, self.weight.to(dtype=x.dtype)) * self.scales
+        return y if self.bias is None else y + self.bias
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, bias={self.bias is not None}"
+
+
+def quantize_int8_(module: nn.Module) -> nn.Module:
+    """Replace every `nn.Linear` in `module` by a `WeightOnlyInt8Linear`, in place."""
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            setattr(module, name, WeightOnlyInt8Linear.from_linear(child))
+        else:
+            quantize_int8_(child)
+    return module
@@ -1,6 +1,19 @@
+import math
+from functools import partial
+from typing import Callable
+
 import torch
 
 
+def exponential_(q: torch.Tensor, generator=None) -> torch.Tensor:
+    """Fill `q` with Exp(1) samples from `generator`, or, given a list, from one generator per row (first dim)."""
+    if isinstance(generator, (list, tuple)):
+        for row, row_generator in zip(q, generator):
+            row.exponential_(1, generator=row_generator)
+        return q
+    return q.exponential_(1, generator=generator)
+
+
 def multinomial(input: torch.Tensor, num_samples: int, replacement=False, *, generator=None):
     """torch.multinomial with arbitrary number of dimensions, and number of candidates on the last dimension.
 
@@ -9,7 +22,8 @@ def multinomial(input: torch.Tensor, num_samples: int, replacement=False, *, gen
         num_samples (int): Number of samples to draw.
         replacement (bool): Whether to draw with replacement or not.
     Keywords args:
-        generator (torch.Generator): A pseudorandom number generator for sampling.
+        generator (torch.Generator): A pseudorandom number generator for sampling. With `num_samples=1`,
+            also a list of generators, one per row of `input`.
     Returns:
         torch.Tensor: Last dimension contains num_samples indices
             sampled from the multinomial probability distribution
@@ -17,7 +31,7 @@ def multinomial(input: torch.Tensor, num_samples: int, replacement=False, *, gen
     """
 
     if num_samples == 1:
-        q = torch.empty_like(input).exponential_(1, generator=generator)
+        q = exponential_(torch.empty_like(input), generator)
         return torch.argmax(input / q, dim=-1, keepdim=True).to(torch.int64)
 
     input_ = input.reshape(-1, input.shape[-1])
@@ -126,6 +140,7 @@ def sample_from_logits(
     generated_tokens: torch.Tensor | None = None,
     repetition_penalty: float = 3.0,
     repetition_penalty_window: int = 2,
+    generator: torch.Generator | list[torch.Generator | None] | None = None,
 ) -> torch.Tensor:
     """Sample next token from logits using either top_k/p/min_p OR using NovelAI's Unified Sampler.
     
@@ -158,25 +173,146 @@ def sample_from_logits(
 
         quad (float): Quadratic - High values make low probablities much lower. -> -2.0 to 2.0, default from gradio 0.0
 
+        generator (torch.Generator): Generator to sample from, for reproducible outputs. A list gives one
+            generator per row of `logits` (None entries use the default generator).
+
     Returns:
         torch.Tensor: Sampled tokens.
     """
-    if repetition_penalty != 1.0 and generated_tokens is not None:
-        logits = modify_logit_for_repetition_penalty(logits, generated_tokens, repetition_penalty, repetition_penalty_window)
-
     if temperature > 0:
-        probs = torch.softmax(logits / temperature, dim=-1)
-        if linear > 0.0:
-            probs = apply_unified(probs, linear, conf, quad)
-        if top_p > 0:
-            probs = apply_top_p(probs, top_p)
-        if top_k > 0:
-            probs = apply_top_k(probs, top_k)
-        if min_p > 0:
-            probs = apply_min_p(probs, min_p)
-
-        next_token = multinomial(probs, num_samples=1)
+        probs = sampling_probs(
+            logits,
+            temperature,
+            top_p,
+            top_k,
+            min_p,
+            linear,
+            conf,
+            quad,
+            generated_tokens,
+            repetition_penalty,
+            repetition_penalty_window,
+        )
+        next_token = multinomial(probs, num_samples=1, generator=generator)
     else:
+        if repetition_penalty != 1.0 and generated_tokens is not None:
+            logits = modify_logit_for_repetition_penalty(
+                logits, generated_tokens, repetition_penalty, repetition_penalty_window
+            )
         next_token = torch.argmax(logits, dim=-1, keepdim=True)
 
     return next_token  # [batch_size, num_codebooks, 1]
+
+
+def sampling_probs(
+    logits: torch.Tensor,
+    temperature: float = 1.0,
+    top_p: float = 0.0,
+    top_k: int = 0,
+    min_p: float = 0.0,
+    linear: float = 0.0,
+    conf: float = 0.0,
+    quad: float = 0.0,
+    generated_tokens: torch.Tensor | None = None,
+    repetition_penalty: float = 3.0,
+    repetition_penalty_window: int = 2,
+) -> torch.Tensor:
+    """
+    The distribution `sample_from_logits` draws from, with the same arguments (one-hot on the argmax for
+    `temperature=0`). Used where the probabilities themselves are needed, as in speculative decoding.
+    """
+    if repetition_penalty != 1.0 and generated_tokens is not None:
+        logits = modify_logit_for_repetition_penalty(logits, generated_tokens, repetition_penalty, repetition_penalty_window)
+
+    if temperature <= 0:
+        return torch.zeros_like(logits).scatter_(-1, logits.argmax(dim=-1, keepdim=True), 1.0)
+
+    probs = torch.softmax(logits / temperature, dim=-1)
+    if linear > 0.0:
+        probs = apply_unified(probs, linear, conf, quad)
+    if top_p > 0:
+        probs = apply_top_p(probs, top_p)
+    if top_k > 0:
+        probs = apply_top_k(probs, top_k)
+    if min_p > 0:
+        probs = apply_min_p(probs, min_p)
+    return probs
+
+
+class FusedSampler:
+    """
+    `sample_from_logits` for the usual decode settings (repetition penalty, temperature and min-p), without
+    full-vocabulary temporaries on every step.
+
+    - The repetition penalty is applied in place, to the logits of the tokens in the window only.
+    - Min-p is a threshold on the logits: `p < min_p * p_max` <=> `logit < logit_max + temperature * log(min_p)`.
+    - Sampling uses the same exponential race as `multinomial` (`argmax(probs / q)`, q ~ Exp(1)), as
+      `argmax(logits / temperature - log(q))`, so no softmax or renormalization is needed.
+
+    Workspaces are allocated for the first logits shape seen and reused while it doesn't change.
+    `logits` is modified in place.
+    """
+
+    def __init__(
+        self,
+        temperature: float = 1.0,
+        min_p: float = 0.0,
+        repetition_penalty: float = 3.0,
+        repetition_penalty_window: int = 2,
+    ):
+        self.temperature = temperature
+        self.min_p = min_p
+        self.repetition_penalty = repetition_penalty
+        self.repetition_penalty_window = repetition_penalty_window
+        self._shape = None
+
+    PARAMS = ("temperature", "min_p", "repetition_penalty", "repetition_penalty_window")
+
+    @classmethod
+    def supports(cls, sampling_params: dict) -> bool:
+        """Whether `sampling_params` (of `sample_from_logits`) only use what this sampler implements."""
+        unsupported = any(v for k, v in sampling_params.items() if k not in cls.PARAMS)
+        return not unsupported and sampling_params.get("temperature", 1.0) > 0
+
+    def _allocate(self, logits: torch.Tensor):
+        self._shape = logits.shape
+        self._noise = torch.empty_like(logits)
+        self._mask = torch.empty_like(logits, dtype=torch.bool)
+        self._max = logits.new_empty(*logits.shape[:-1], 1)
+        self._tokens = torch.empty(*logits.shape[:-1], 1, dtype=torch.int64, device=logits.device)
+
+    def __call__(
+        self,
+        logits: torch.Tensor,
+        generated_tokens: torch.Tensor | None = None,
+        generator: torch.Generator | list[torch.Generator | None] | None = None,
+    ) -> torch.Tensor:
+        if logits.shape != self._shape:
+            self._allocate(logits)
+
+        if self.repetition_penalty != 1.0 and generated_tokens is not None:
+            window = generated_tokens[..., -self.repetition_penalty_window :]
+            window = window.clamp_max(logits.shape[-1] - 1).to(torch.int64)
+            # One token of the window at a time, so that repeats in the window compound like the reference's product
+            for i in range(window.shape[-1]):
+                idx = window[..., i : i + 1]
+                picked = logits.gather(-1, idx)
+                penalized = torch.where(picked <= 0, picked * self.repetition_penalty, picked / self.repetition_penalty)
+                logits.scatter_(-1, idx, penalized)
+
+        logits.div_(self.temperature)
+        if self.min_p > 0:
+            torch.amax(logits, dim=-1, keepdim=True, out=self._max)
+            torch.lt(logits, self._max.add_(math.log(self.min_p)), out=self._mask)
+            logits.masked_fill_(self._mask, -torch.inf)
+
+        exponential_(self._noise, generator).log_()
+        logits.sub_(self._noise)
+        return torch.argmax(logits, dim=-1, keepdim=True, out=self._tokens)  # [batch_size, num_codebooks, 1]
+
+
+def make_sampler(sampling_params: dict) -> Callable[..., torch.Tensor]:
+    """A `FusedSampler` when it supports `sampling_params`, `sample_from_logits` with those parameters otherwise."""
+    if FusedSampler.supports(sampling_params):
+        return FusedSampler(**{k: v for k, v in sampling_params.items() if k in FusedSampler.PARAMS})
+    return partial(sample_from_logits, **sampling_params)
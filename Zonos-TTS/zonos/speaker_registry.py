@@ -0,0 +1,104 @@
+import hashlib
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+import safetensors
+import torch
+import torchaudio
+from safetensors.torch import save_file
+
+from zonos.speaker_cloning import SpeakerEmbeddingLDA
+from zonos.utils import DEFAULT_DEVICE
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class SpeakerRegistry:
+    """
+    Speaker embeddings by voice id, computed once and stored as `<store_dir>/<voice_id>.safetensors`.
+
+    Each stored embedding records the sha256 of the audio it was computed from, and is recomputed
+    only when that audio changes. A voice whose source audio is not present is served from its
+    stored embedding as is, so serving nodes only need the store and never load the ResNet293
+    speaker model. Embeddings are loaded lazily, on first use of a voice.
+    """
+
+    def __init__(self, store_dir: str | Path, sources: dict[str, str | Path] | None = None):
+        self.store_dir = Path(store_dir)
+        self.sources = {voice_id: Path(path) for voice_id, path in (sources or {}).items()}
+        self._embeddings: dict[str, torch.Tensor] = {}
+        self._digests: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.spk_clone_model = None
+
+    @property
+    def voice_ids(self) -> list[str]:
+        stored = (path.stem for path in self.store_dir.glob("*.safetensors"))
+        return sorted({*self.sources, *stored})
+
+    def __contains__(self, voice_id: str) -> bool:
+        """Whether `voice_id` can be served: its source audio or its stored embedding is there."""
+        try:
+            path = self._path(voice_id)
+        except KeyError:
+            return False
+        source = self.sources.get(voice_id)
+        return (source is not None and source.exists()) or path.exists()
+
+    def get(self, voice_id: str, device: torch.device | str = DEFAULT_DEVICE) -> torch.Tensor:
+        """Embedding of `voice_id`, as `Zonos.make_speaker_embedding` would compute it."""
+        with self._lock:
+            if voice_id not in self._embeddings:
+                self._embeddings[voice_id] = self._load_or_compute(voice_id).to(device)
+            return self._embeddings[voice_id]
+
+    def digest(self, voice_id: str) -> str:
+        """Content hash of the audio the embedding of `voice_id` was computed from."""
+        self.get(voice_id)
+        return self._digests[voice_id]
+
+    def _load_or_compute(self, voice_id: str) -> torch.Tensor:
+        path = self._path(voice_id)
+        source = self.sources.get(voice_id)
+        source_digest = file_sha256(source) if source is not None and source.exists() else None
+
+        if path.exists():
+            with safetensors.safe_open(path, framework="pt") as f:
+                stored_digest = f.metadata()["source_sha256"]
+                if source_digest is None or source_digest == stored_digest:
+                    self._digests[voice_id] = stored_digest
+                    return f.get_tensor("embedding")
+
+        if source_digest is None:
+            raise KeyError(f"Unknown voice: {voice_id}")
+
+        if self.spk_clone_model is None:
+            self.spk_clone_model = SpeakerEmbeddingLDA()
+        wav, sr = torchaudio.load(source)
+        _, embedding = self.spk_clone_model(wav.to(self.spk_clone_model.device), sr)
+        embedding = embedding.unsqueeze(0).bfloat16().cpu()
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # a temporary file of its own, so that other processes storing the same voice never share it
+        with tempfile.NamedTemporaryFile(dir=self.store_dir, suffix=".tmp", delete=False) as f:
+            tmp_path = Path(f.name)
+        try:
+            save_file({"embedding": embedding.contiguous()}, tmp_path, metadata={"source_sha256": source_digest})
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._digests[voice_id] = source_digest
+        return embedding
+
+    def _path(self, voice_id: str) -> Path:
+        if not isinstance(voice_id, str) or not re.fullmatch(r"[A-Za-z0-9_-]+", voice_id):
+            raise KeyError(f"Invalid voice id: {voice_id!r}")
+        return self.store_dir / f"{voice_id}.safetensors"
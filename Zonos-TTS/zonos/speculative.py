@@ -0,0 +1,233 @@
+from dataclasses import dataclass
+
+import torch
+
+from zonos.codebook_pattern import apply_delay_pattern
+from zonos.config import InferenceParams
+from zonos.model import Zonos
+from zonos.sampling import multinomial, sampling_probs
+
+
+def accept_draft(
+    probs: torch.Tensor,
+    draft_probs: torch.Tensor,
+    draft_tokens: torch.Tensor,
+    generator: torch.Generator | None = None,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Speculative sampling of one frame, codebook by codebook. `probs` / `draft_probs` `[bsz, 9, vocab]` are
+    the target and draft distributions, `draft_tokens` `[bsz, 9, 1]` was drawn from `draft_probs`.
+
+    Each token is kept with probability min(1, p / q), and otherwise replaced by a draw from the residual
+    max(p - q, 0). The 9 codebooks of a frame are independent given the context, under both models, so
+    this yields an exact sample of the target's frame distribution. Returns the tokens and which of them
+    are the draft's `[bsz, 9, 1]`.
+    """
+    p = probs.gather(-1, draft_tokens)
+    q = draft_probs.gather(-1, draft_tokens)
+    u = torch.rand(p.shape, generator=generator, device=p.device)
+    accepted = u * q <= p
+
+    residual = (probs - draft_probs).clamp_min_(0)
+    norm = residual.sum(dim=-1, keepdim=True)
+    residual = torch.where(norm > 0, residual / norm.clamp_min(1e-20), probs)  # p == q: never rejected anyway
+    resampled = multinomial(residual, num_samples=1, generator=generator)
+    return torch.where(accepted, draft_tokens, resampled), accepted
+
+
+@dataclass
+class SpeculativeStats:
+    frames: int = 0  # frames generated
+    forwards: int = 0  # forwards of the target model, one per frame without speculation
+    drafted: int = 0  # frames proposed by the draft model
+    accepted: int = 0  # of which kept
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    @property
+    def frames_per_forward(self) -> float:
+        """Frames per target forward, the speedup over plain decoding if draft steps were free."""
+        return self.frames / self.forwards if self.forwards else 0.0
+
+
+class SpeculativeDecoder:
+    """
+    Speculative decoding of a `Zonos` model with a smaller draft `Zonos` model.
+
+    Each step, the draft proposes up to `num_draft_frames` frames one at a time, and the target scores all
+    of them in a single forward (`Zonos._compute_logits` with `num_positions`). Frames are accepted by
+    speculative sampling (see `accept_draft`) up to the first rejected one, which is replaced by a sample of
+    the target; when all are accepted the target's last logits give one more frame. Outputs follow the
+    target's sampling distribution, so speculation only changes how many target forwards a sequence takes.
+
+    Both models need a backbone with `multi_token_decode` (the torch backbone): rejected frames are dropped
+    from their caches by lowering the cache lengths. Generates one utterance at a time; once EOS is
+    sampled, its 9-frame tail is decoded one frame at a time by the target alone.
+
+    `stats` accumulates over calls.
+    """
+
+    def __init__(
+        self,
+        model: Zonos,
+        draft_model: Zonos,
+        num_draft_frames: int = 4,
+        sampling_params: dict | None = None,
+    ):
+        for m in (model, draft_model):
+            if not getattr(m.backbone, "multi_token_decode", False):
+                raise ValueError(f"{type(m.backbone).__name__} can't verify multi-frame drafts")
+        self.model = model
+        self.draft_model = draft_model
+        self.num_draft_frames = num_draft_frames
+        self.sampling_params = dict(min_p=0.1) if sampling_params is None else sampling_params
+        self.stats = SpeculativeStats()
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        prefix_conditioning: torch.Tensor,  # [2, cond_seq_len, d_model], from `model.prepare_conditioning`
+        draft_prefix_conditioning: torch.Tensor,  # the same, from `draft_model.prepare_conditioning`
+        max_new_tokens: int = 86 * 60,
+        cfg_scale: float = 2.0,
+        generator: torch.Generator | None = None,
+    ) -> torch.Tensor:
+        """Codes `[1, 9, seq_len]` of one utterance, like `Zonos.generate`."""
+        model, draft_model = self.model, self.draft_model
+        device = model.device
+        eos_token_id, masked_token_id = model.eos_token_id, model.masked_token_id
+        num_rows = 1 if cfg_scale == 1.0 else 2
+        prefix_conditioning = prefix_conditioning[:num_rows]
+        draft_prefix_conditioning = draft_prefix_conditioning[:num_rows]
+
+        with torch.device(device):
+            delayed_codes = apply_delay_pattern(torch.full((1, 9, max_new_tokens), -1), masked_token_id)
+            seq_len = delayed_codes.shape[2]
+            cache = model.setup_cache(num_rows, prefix_conditioning.shape[1] + seq_len + 9)
+            draft_cache = draft_model.setup_cache(num_rows, draft_prefix_conditioning.shape[1] + seq_len + 9)
+
+        logits = model._prefill(prefix_conditioning, delayed_codes[..., :1], cache, cfg_scale)
+        draft_model._prefill(draft_prefix_conditioning, delayed_codes[..., :1], draft_cache, cfg_scale)
+        self._set_length(cache, prefix_conditioning.shape[1] + 1)
+        self._set_length(draft_cache, draft_prefix_conditioning.shape[1] + 1)
+        draft_fed = 1  # frames of `delayed_codes` in the draft cache (the target cache always has `offset`)
+
+        logit_bias = torch.zeros_like(logits)
+        logit_bias[:, 1:, eos_token_id] = -torch.inf  # only allow codebook 0 to predict EOS
+
+        offset = 1
+        self._write(delayed_codes, offset, self._sample(logits + logit_bias, delayed_codes[..., :offset], generator))
+        self.stats.frames += 1
+        remaining = seq_len - offset
+        stopping = False
+
+        while remaining > 0:
+            # Speculate while the whole draft and the target's extra frame fit before the end
+            num_draft = min(self.num_draft_frames, remaining - 1, seq_len - 2 - offset)
+            if stopping or num_draft <= 0:
+                break
+
+            saved = delayed_codes[..., offset + 1 : offset + num_draft + 2].clone()  # masked prefix or unknown
+
+            # Draft: catch up on the frames it hasn't seen, then propose `num_draft` frames
+            draft_logits = self._extend(draft_model, draft_cache, delayed_codes[..., draft_fed : offset + 1], cfg_scale)
+            draft_fed = offset + 1
+            draft_probs = []
+            for i in range(1, num_draft + 1):
+                if i > 1:
+                    last_frame = delayed_codes[..., offset + i - 1 : offset + i]
+                    draft_logits = self._extend(draft_model, draft_cache, last_frame, cfg_scale)
+                    draft_fed += 1
+                probs = self._probs(draft_logits[:, :, -1] + logit_bias, delayed_codes[..., : offset + i])
+                draft_probs.append(probs)
+                self._write(delayed_codes, offset + i, multinomial(probs, num_samples=1, generator=generator))
+
+            # Target: score the current frame and all drafts in one forward
+            target_logits = self._extend(model, cache, delayed_codes[..., offset : offset + num_draft + 1], cfg_scale)
+            self.stats.forwards += 1
+            self.stats.drafted += num_draft
+
+            num_new = num_draft + 1
+            for i in range(1, num_draft + 2):
+                probs = self._probs(target_logits[:, :, i - 1] + logit_bias, delayed_codes[..., : offset + i])
+                forced = saved[..., i - 1 : i] != -1  # masked tokens of the delay pattern
+                if i <= num_draft:
+                    draft_tokens = delayed_codes[..., offset + i : offset + i + 1]
+                    tokens, accepted = accept_draft(probs, draft_probs[i - 1], draft_tokens, generator)
+                    accepted = bool((accepted | forced).all())
+                else:  # every draft accepted: one more frame from the target
+                    tokens, accepted = multinomial(probs, num_samples=1, generator=generator), False
+                if int(tokens[0, 0, 0]) == eos_token_id:
+                    stopping = True
+                    self._force_eos_tail(tokens, min(remaining - (i - 1), 9), masked_token_id, eos_token_id)
+                delayed_codes[..., offset + i : offset + i + 1] = torch.where(forced, saved[..., i - 1 : i], tokens)
+                if i <= num_draft and accepted:
+                    self.stats.accepted += 1
+                if stopping or not accepted:
+                    num_new = i
+                    break
+
+            # Drop what came after the last kept frame, in the codes and in both caches
+            delayed_codes[..., offset + num_new + 1 : offset + num_draft + 2] = saved[..., num_new:]
+            offset += num_new
+            draft_fed = min(draft_fed, offset)
+            self._set_length(cache, prefix_conditioning.shape[1] + offset)
+            self._set_length(draft_cache, draft_prefix_conditioning.shape[1] + draft_fed)
+            self.stats.frames += num_new
+            remaining -= num_new
+            if stopping:
+                remaining = min(remaining + 1, 9) - 1  # the EOS frame starts the 9-frame tail, like `generate`
+
+        # EOS tail and the last frames before the end, one target forward per frame
+        while remaining > 0:
+            offset += 1
+            logits = self._extend(model, cache, delayed_codes[..., offset - 1 : offset], cfg_scale)[:, :, -1]
+            self.stats.forwards += 1
+            next_token = self._sample(logits + logit_bias, delayed_codes[..., :offset], generator)
+            if not stopping and int(next_token[0, 0, 0]) == eos_token_id:
+                stopping = True
+                remaining = min(remaining, 9)
+            if stopping:
+                self._force_eos_tail(next_token, remaining, masked_token_id, eos_token_id)
+            self._write(delayed_codes, offset, next_token)
+            self.stats.frames += 1
+            remaining -= 1
+
+        return model._finalize_codes(delayed_codes, offset)
+
+    def _probs(self, logits: torch.Tensor, generated_tokens: torch.Tensor) -> torch.Tensor:
+        return sampling_probs(logits, generated_tokens=generated_tokens, **self.sampling_params)
+
+    def _sample(self, logits: torch.Tensor, generated_tokens: torch.Tensor, generator: torch.Generator | None):
+        return multinomial(self._probs(logits, generated_tokens), num_samples=1, generator=generator)
+
+    @staticmethod
+    def _force_eos_tail(tokens: torch.Tensor, remaining: int, masked_token_id: int, eos_token_id: int):
+        """As in `Zonos.generate` once stopping: codebooks before the one at its EOS step are masked, it gets EOS."""
+        eos_codebook_idx = min(9 - remaining, 9 - 1)
+        tokens[:, :eos_codebook_idx] = masked_token_id
+        tokens[:, eos_codebook_idx] = eos_token_id
+
+    @staticmethod
+    def _write(delayed_codes: torch.Tensor, offset: int, tokens: torch.Tensor):
+        """Write a sampled frame, keeping the masked tokens of the delay pattern."""
+        frame = delayed_codes[..., offset : offset + 1]
+        frame.copy_(torch.where(frame == -1, tokens, frame))
+
+    @staticmethod
+    def _extend(model: Zonos, cache: InferenceParams, input_ids: torch.Tensor, cfg_scale: float) -> torch.Tensor:
+        """Append the frames `input_ids` `[1, 9, n]` to `cache`, returning the logits `[1, 9, n, vocab]` after each."""
+        hidden_states = model.embed_codes(input_ids)
+        if cfg_scale != 1.0:
+            hidden_states = hidden_states.repeat(2, 1, 1)
+        logits = model._compute_logits(hidden_states, cache, cfg_scale, num_positions=input_ids.shape[2])
+        SpeculativeDecoder._set_length(cache, cache.seqlen_offset + input_ids.shape[2])
+        return logits
+
+    @staticmethod
+    def _set_length(cache: InferenceParams, length: int):
+        """Set how many tokens every row of `cache` holds; entries past it are ignored and overwritten."""
+        cache.seqlen_offset = length
+        cache.lengths_per_sample.fill_(length)
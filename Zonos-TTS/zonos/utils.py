@@ -1,6 +1,10 @@
+import json
+import os
+import struct
+from contextlib import contextmanager
+
 import torch
 import torch.nn as nn
-import torch.nn.functional as F
 
 
 def find_multiple(n: int, k: int) -> int:
@@ -9,22 +13,74 @@ def find_multiple(n: int, k: int) -> int:
     return n + k - (n % k)
 
 
-def pad_weight_(w: nn.Embedding | nn.Linear, multiple: int):
-    """Pad the weight of an embedding or linear layer to a multiple of `multiple`."""
-    if isinstance(w, nn.Embedding):
-        # Pad input dim
-        if w.weight.shape[1] % multiple == 0:
-            return
-        w.weight.data = F.pad(w.weight.data, (0, 0, 0, w.weight.shape[1] % multiple))
-        w.num_embeddings, w.embedding_dim = w.weight.shape
-    elif isinstance(w, nn.Linear):
-        # Pad output dim
-        if w.weight.shape[0] % multiple == 0:
-            return
-        w.weight.data = F.pad(w.weight.data, (0, 0, 0, w.weight.shape[0] % multiple))
-        w.out_features, w.in_features = w.weight.shape
-    else:
-        raise ValueError(f"Unsupported weight type: {type(w)}")
+def bucket_length(n: int, min_length: int = 512) -> int:
+    """
+    Smallest of min_length * (1, 1.5, 2, 3, 4, 6, ...) that is at least `n`. Sequence lengths rounded to these
+    give static-shape code a handful of shapes to compile for, at most 1.5x larger than needed.
+    """
+    bucket = min_length
+    while bucket < n:
+        bucket = bucket * 3 // 2 if bucket & (bucket - 1) == 0 else bucket * 4 // 3
+    return bucket
+
+
+@contextmanager
+def init_empty_parameters():
+    """Create the parameters of modules built in this context on the meta device, so that they can be
+    assigned from a checkpoint without being materialized first. Buffers are still created normally."""
+    register_parameter = nn.Module.register_parameter
+
+    def register_empty_parameter(module: nn.Module, name: str, param: nn.Parameter | None):
+        register_parameter(module, name, param)
+        if param is not None:
+            param = module._parameters[name]
+            module._parameters[name] = type(param)(param.to("meta"), requires_grad=param.requires_grad)
+
+    nn.Module.register_parameter = register_empty_parameter
+    try:
+        yield
+    finally:
+        nn.Module.register_parameter = register_parameter
+
+
+_SAFETENSORS_DTYPES = {
+    "BOOL": torch.bool,
+    "U8": torch.uint8,
+    "I8": torch.int8,
+    "I16": torch.int16,
+    "I32": torch.int32,
+    "I64": torch.int64,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F32": torch.float32,
+    "F64": torch.float64,
+}
+
+
+def load_safetensors_mmap(path: str | os.PathLike) -> dict[str, torch.Tensor]:
+    """
+    Load a safetensors file as CPU tensors that are views into a private memory map of the file.
+    Nothing is read until a tensor is touched, and processes mapping the same file share its pages.
+    """
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    header.pop("__metadata__", None)
+
+    nbytes = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(os.fspath(path), shared=False, nbytes=nbytes)
+    buffer = torch.empty(0, dtype=torch.uint8).set_(storage, 0, (nbytes,), (1,))
+
+    data_start = 8 + header_len
+    tensors = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        data = buffer[data_start + start : data_start + end]
+        if (data_start + start) % dtype.itemsize:
+            data = data.clone()  # unaligned, can't be viewed as `dtype` in place
+        tensors[name] = data.view(dtype).view(info["shape"])
+    return tensors
 
 
 def get_device() -> torch.device: